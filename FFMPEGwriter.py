@@ -34,10 +34,9 @@ class FFMPEGVideoWriter:
       smaller files. Type ``ffmpeg -codecs`` in a terminal to get a list
       of accepted codecs.
 
-      Note for default 'libx264': by default the pixel format yuv420p
-      is used. If the video dimensions are not both even (e.g. 720x405)
-      another pixel format is used, and this can cause problem in some
-      video readers.
+      Note for default 'libx264': the pixel format yuv420p is used, which
+      needs even video dimensions. If the frames are not both even (e.g.
+      720x405) the video is padded by one pixel at the right or bottom edge.
 
     audiofile
       Optional: The name of an audio file that will be incorporated
@@ -47,7 +46,7 @@ class FFMPEGVideoWriter:
       Sets the time that FFMPEG will take to compress the video. The slower,
       the better the compression rate. Possibilities are: ultrafast,superfast,
       veryfast, faster, fast, medium (default), slow, slower, veryslow,
-      placebo.
+      placebo. Use None for codecs without presets, such as 'ffv1'.
 
     bitrate
       Only relevant for codecs which accept a bitrate. "5000k" offers
@@ -84,8 +83,11 @@ class FFMPEGVideoWriter:
         ]
         cmd.extend([
             '-vcodec', codec,
-            '-preset', preset,
         ])
+        if preset is not None:
+            cmd.extend([
+                '-preset', preset
+            ])
         if ffmpeg_params is not None:
             cmd.extend(ffmpeg_params)
         if bitrate is not None:
@@ -95,9 +97,11 @@ class FFMPEGVideoWriter:
         if threads is not None:
             cmd.extend(["-threads", str(threads)])
 
-        if ((codec == 'libx264') and
-                (size[0] % 2 == 0) and
-                (size[1] % 2 == 0)):
+        if codec == 'libx264':
+            if size[0] % 2 or size[1] % 2:
+                cmd.extend([
+                    '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2'
+                ])
             cmd.extend([
                 '-pix_fmt', 'yuv420p'
             ])
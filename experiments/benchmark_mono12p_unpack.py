@@ -0,0 +1,37 @@
+import os
+import sys
+from time import perf_counter
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from unpacking import Mono12Unpacker  # noqa: E402
+
+# full sensor of the camera and the rate it delivers Mono12p at
+WIDTH = 2448
+HEIGHT = 2048
+SENSOR_FPS = 75
+NUM_FRAMES = 200
+
+# random 12-bit frames, packed the way the camera sends them
+rng = np.random.default_rng(0)
+pixels = rng.integers(0, 4096, HEIGHT * WIDTH, dtype=np.uint16)
+first = pixels[0::2].astype(np.uint32)
+second = pixels[1::2].astype(np.uint32)
+packed = np.stack([first & 0xFF, (first >> 8) | ((second & 0x0F) << 4),
+                   second >> 4], axis=1).astype(np.uint8).ravel()
+
+unpacker = Mono12Unpacker(HEIGHT, WIDTH, "Mono12p")
+assert np.array_equal(unpacker(packed).ravel(), pixels), "unpacking is wrong"
+
+start = perf_counter()
+for _ in range(NUM_FRAMES):
+    unpacker(packed)
+elapsed = perf_counter() - start
+
+fps = NUM_FRAMES / elapsed
+print("unpacked %d frames of %dx%d Mono12p in %.3f s" %
+      (NUM_FRAMES, WIDTH, HEIGHT, elapsed))
+print("%.1f frames per second, %.1f MB/s of packed data, sensor needs %d fps"
+      % (fps, fps * packed.nbytes / 1e6, SENSOR_FPS))
+print("keeps up with the sensor" if fps >= SENSOR_FPS else
+      "too slow for the sensor")
@@ -0,0 +1,31 @@
+import os
+import sys
+
+# Start emulation with two cameras, this has to happen before pylon is loaded
+os.environ["PYLON_CAMEMU"] = "2"  # Number of cameras to emulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from two_basler_video import videos_from_two_cameras  # noqa: E402
+
+FPS = 20
+RECORDING_TIME = 5  # in seconds
+# emulated frames are rendered one after the other on the host, so their
+# spread is several ms where real cameras stay well below one, but a frame
+# must never be so late that it is closer to the next trigger
+P99_SPREAD = 12.0  # in milliseconds, camera spread of 99% of the frames
+MAX_SPREAD = 0.5 * 1000 / FPS  # in milliseconds, worst case camera spread
+
+# record with the software trigger scheduler on the emulated cameras
+report = videos_from_two_cameras("./emuvid1.avi", "./emuvid2.avi",
+                                 RECORDING_TIME, "Mono8", 10000, FPS, "gray",
+                                 "FFMPEG", triggered=True)
+
+numImages = int(FPS * RECORDING_TIME)
+for stats in report["trigger"]["latency"]:
+    assert stats["frames"] == numImages, "camera dropped triggered frames"
+spread = report["trigger"]["spread"]
+assert spread["p99"] < P99_SPREAD, \
+    "1%% of frames are further apart than %.1f ms" % P99_SPREAD
+assert spread["max"] < MAX_SPREAD, \
+    "cameras are further apart than %.1f ms" % MAX_SPREAD
+print("triggered capture on the emulator is within limits")
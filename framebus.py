@@ -0,0 +1,275 @@
+from multiprocessing import shared_memory
+from time import sleep, perf_counter
+import numpy as np
+
+# Shared memory layout, all header fields are int64:
+#   [0] number of slots  [1] number of dimensions  [2..5] frame shape
+#   [6] dtype character  [7] latest published sequence number (-1 for none)
+# followed by one sequence number per slot, one float64 timestamp per slot
+# and then the frame slots themselves.
+_HEADER_LEN = 8
+_MAX_DIMS = 4
+_LATEST = 7
+
+# names of the blocks published from this process
+_published = set()
+
+
+class FrameBusOverrun(Exception):
+    """Raised when a subscriber falls behind by more than the ring size.
+
+    The 'missed' attribute holds the number of frames that were overwritten
+    before they could be read. The subscriber has already skipped ahead to the
+    oldest frame still in the ring when this is raised.
+    """
+
+    def __init__(self, missed):
+        super().__init__("frame bus overrun, %d frames missed" % missed)
+        self.missed = missed
+
+
+def _layout(nslots, shape, dtype):
+    """Returns byte offsets of slot sequence numbers, timestamps and frames."""
+    seqOffset = _HEADER_LEN * 8
+    timeOffset = seqOffset + nslots * 8
+    dataOffset = timeOffset + nslots * 8
+    frameBytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return seqOffset, timeOffset, dataOffset, frameBytes
+
+
+class FrameBusPublisher:
+    """Publishes grabbed frames into a shared-memory ring buffer.
+
+    The ring is created on the first published frame, so its frame shape and
+    dtype follow whatever the camera delivers. Publishing never waits for
+    subscribers: the oldest slot is simply overwritten, and every slot carries
+    the sequence number of the frame it holds so subscribers can tell when
+    that happened. While a slot is being written its sequence number is -1.
+
+    Parameters
+    -----------
+
+    name
+      Name of the shared memory block, subscribers attach with the same name.
+
+    slots
+      Number of frames kept in the ring. Larger rings give slow subscribers
+      more slack before they are overrun.
+    """
+
+    def __init__(self, name, slots=16):
+        self.name = name
+        self.slots = slots
+        self.seq = -1
+        self.shm = None
+
+    def _create(self, frame):
+        shape = frame.shape
+        if len(shape) > _MAX_DIMS:
+            raise ValueError("frames with more than %d dimensions can not be "
+                             "published" % _MAX_DIMS)
+        seqOffset, timeOffset, dataOffset, frameBytes = _layout(
+            self.slots, shape, frame.dtype)
+        self.shm = shared_memory.SharedMemory(
+            name=self.name, create=True,
+            size=dataOffset + self.slots * frameBytes)
+        _published.add(self.shm.name)
+
+        self._header = np.ndarray((_HEADER_LEN,), np.int64, self.shm.buf)
+        self._header[1] = len(shape)
+        self._header[2:2 + len(shape)] = shape
+        self._header[6] = ord(frame.dtype.char)
+        self._header[_LATEST] = -1
+        self._slotSeq = np.ndarray((self.slots,), np.int64, self.shm.buf,
+                                   seqOffset)
+        self._slotSeq[:] = -1
+        self._slotTime = np.ndarray((self.slots,), np.float64, self.shm.buf,
+                                    timeOffset)
+        self._frames = np.ndarray((self.slots,) + shape, frame.dtype,
+                                  self.shm.buf, dataOffset)
+        # subscribers wait for a nonzero slot count, so it is written last
+        self._header[0] = self.slots
+
+    def publish(self, frame, timestamp=None):
+        """Copies one frame into the next slot of the ring.
+
+        :param frame: numpy array, same shape and dtype as the first frame
+        :param timestamp: float frame time, defaults to the performance counter
+
+        :returns: int sequence number of the published frame
+        """
+        if self.shm is None:
+            self._create(frame)
+
+        self.seq += 1
+        slot = self.seq % self.slots
+        self._slotSeq[slot] = -1
+        self._frames[slot] = frame
+        self._slotTime[slot] = perf_counter() if timestamp is None \
+            else timestamp
+        self._slotSeq[slot] = self.seq
+        self._header[_LATEST] = self.seq
+
+        return self.seq
+
+    def close(self):
+        """Releases and removes the shared memory block."""
+        if self.shm is not None:
+            # drop our views before the buffer is closed
+            self._header = self._slotSeq = self._slotTime = None
+            self._frames = None
+            _published.discard(self.shm.name)
+            self.shm.close()
+            self.shm.unlink()
+
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FrameBusSubscriber:
+    """Reads frames published by a FrameBusPublisher in another process.
+
+    Frames are returned as numpy views straight into shared memory, nothing
+    is copied. A view stays valid only until the publisher wraps around to its
+    slot again, so after processing a frame call 'valid' with its sequence
+    number to confirm it was not overwritten while in use, or copy it if it
+    has to be kept.
+
+    Parameters
+    -----------
+
+    name
+      Name of the shared memory block used by the publisher.
+
+    timeout
+      Seconds to wait for the publisher to create the block.
+    """
+
+    def __init__(self, name, timeout=10.0):
+        deadline = perf_counter() + timeout
+        while True:
+            try:
+                self.shm = _attach(name)
+                break
+            except FileNotFoundError:
+                if perf_counter() > deadline:
+                    raise
+                sleep(0.01)
+
+        header = np.ndarray((_HEADER_LEN,), np.int64, self.shm.buf)
+        while header[0] == 0:
+            if perf_counter() > deadline:
+                raise TimeoutError("frame bus %s was never set up" % name)
+            sleep(0.01)
+        self.slots = int(header[0])
+        shape = tuple(int(d) for d in header[2:2 + header[1]])
+        dtype = np.dtype(chr(header[6]))
+        seqOffset, timeOffset, dataOffset, _ = _layout(self.slots, shape,
+                                                       dtype)
+        self._header = header
+        self._slotSeq = np.ndarray((self.slots,), np.int64, self.shm.buf,
+                                   seqOffset)
+        self._slotTime = np.ndarray((self.slots,), np.float64, self.shm.buf,
+                                    timeOffset)
+        self._frames = np.ndarray((self.slots,) + shape, dtype, self.shm.buf,
+                                  dataOffset)
+        # start from the newest frame, older ones were never missed by us
+        self.next_seq = max(int(header[_LATEST]), 0)
+        self.missed = 0
+
+    def latest(self):
+        """Returns the most recently published frame.
+
+        :returns: tuple of int sequence number, float timestamp and frame
+                  view, or None if nothing was published yet
+        """
+        while True:
+            seq = int(self._header[_LATEST])
+            if seq < 0:
+                return None
+            slot = seq % self.slots
+            if self._slotSeq[slot] != seq:
+                continue
+            timestamp = float(self._slotTime[slot])
+            if self._slotSeq[slot] == seq:
+                return seq, timestamp, self._frames[slot]
+
+    def next(self, timeout=1.0):
+        """Returns the next frame in order, waiting for it if needed.
+
+        The first call returns the newest frame published before this
+        subscriber attached, if there is one.
+
+        :param timeout: float seconds to wait for a new frame
+
+        :returns: tuple of int sequence number, float timestamp and frame
+                  view, or None if no new frame arrived in time
+        :raises FrameBusOverrun: if frames were overwritten before this
+                                 subscriber read them
+        """
+        deadline = perf_counter() + timeout
+        while int(self._header[_LATEST]) < self.next_seq:
+            if perf_counter() > deadline:
+                return None
+            sleep(0.0005)
+
+        seq = self.next_seq
+        slot = seq % self.slots
+        timestamp = float(self._slotTime[slot])
+        if not self.valid(seq) or \
+                int(self._header[_LATEST]) - seq >= self.slots:
+            self._skip_to_oldest(seq)
+        self.next_seq = seq + 1
+
+        return seq, timestamp, self._frames[slot]
+
+    def valid(self, seq):
+        """Checks that the slot of a returned frame still holds that frame.
+
+        :param seq: int sequence number returned with the frame
+
+        :returns: bool True if the frame view was not overwritten
+        """
+        return self._slotSeq[seq % self.slots] == seq
+
+    def _skip_to_oldest(self, seq):
+        # leave one slot of margin for the frame currently being published
+        oldest = int(self._header[_LATEST]) - self.slots + 2
+        missed = max(oldest - seq, 1)
+        self.next_seq = seq + missed
+        self.missed += missed
+        raise FrameBusOverrun(missed)
+
+    def close(self):
+        """Detaches from the shared memory block without removing it."""
+        if self.shm is not None:
+            self._header = self._slotSeq = self._slotTime = None
+            self._frames = None
+            self.shm.close()
+
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _attach(name):
+    """Attaches to an existing block without handing it to this process'
+    resource tracker, which would otherwise unlink it when we exit. Blocks
+    published from this process are already tracked by their publisher."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.name not in _published:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
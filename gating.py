@@ -0,0 +1,162 @@
+from collections import deque
+import numpy as np
+
+
+class ActivityGate:
+    """Drops frames of a static scene before they are encoded.
+
+    Every frame is compared with a running background on a view that keeps
+    only every 'downsample'-th pixel in each direction. The change metric is
+    the mean absolute difference between that view and the background, in
+    pixel values. A frame is active when the metric is above 'threshold'.
+    Only idle frames are blended into the background, so activity does not
+    leak into it and the scene counts as idle again as soon as it is back to
+    what it was. A lasting change, such as a light being switched on, would
+    then keep every frame active, so after 'relearnAfter' active frames in a
+    row the background is reset to the current frame.
+
+    Active frames are kept, along with 'postRoll' frames after the last active
+    one and the 'preRoll' frames before the first, which are held back in a
+    small ring of copies until it is known whether they are needed. While the
+    scene is idle only one keep-alive frame every 'keepAlive' frames is kept.
+    The frame number and timestamp of every kept frame are recorded in 'kept'
+    so the timeline can be rebuilt, see 'save'.
+
+    Parameters
+    -----------
+
+    threshold
+      Mean absolute difference, in pixel values, above which a frame counts as
+      active.
+
+    preRoll, postRoll
+      Number of frames kept before and after activity.
+
+    keepAlive
+      While idle, keep one frame in this many. None keeps no idle frames.
+
+    downsample
+      Step between compared pixels in both directions.
+
+    alpha
+      Weight of each new idle frame in the running background, between 0 and
+      1.
+
+    relearnAfter
+      Number of active frames in a row after which the background is reset to
+      the current frame. None never resets it.
+    """
+
+    def __init__(self, threshold, preRoll=10, postRoll=20, keepAlive=100,
+                 downsample=8, alpha=0.05, relearnAfter=1000):
+        self.threshold = threshold
+        self.preRoll = preRoll
+        self.postRoll = postRoll
+        self.keepAlive = keepAlive
+        self.downsample = downsample
+        self.alpha = alpha
+        self.relearnAfter = relearnAfter
+        self.kept = []
+        self.frames = 0
+
+    def filter(self, frames, frameTimes):
+        """Yields the frames worth keeping, in order.
+
+        The yielded arrays are either the incoming frames or pre-roll copies
+        owned by the gate, which are reused, so each must be written before
+        the next one is requested.
+
+        :param frames: iterable of numpy arrays
+        :param frameTimes: list of frame times, one per frame
+
+        :returns: generator of kept frames
+        """
+        ring = None
+        held = deque()
+        # the first frame is always kept as a keep-alive frame
+        lastKept = -self.keepAlive if self.keepAlive else -1
+        activeUntil = -1
+
+        for idx, (frame, timestamp) in enumerate(zip(frames, frameTimes)):
+            self.frames = idx + 1
+            if ring is None:
+                ring = [np.empty_like(frame) for _ in range(self.preRoll)]
+                self._setup(frame)
+
+            if self._active(frame):
+                activeUntil = idx + self.postRoll
+
+            if idx <= activeUntil:
+                # flush the pre-roll before the frame that triggered it
+                while held:
+                    heldIdx, heldTime, slot = held.popleft()
+                    self.kept.append((heldIdx, heldTime))
+                    yield ring[slot]
+            elif self.keepAlive is not None and \
+                    idx - lastKept >= self.keepAlive:
+                held.clear()
+            else:
+                if self.preRoll:
+                    if len(held) == self.preRoll:
+                        held.popleft()
+                    slot = idx % self.preRoll
+                    np.copyto(ring[slot], frame)
+                    held.append((idx, timestamp, slot))
+                continue
+
+            lastKept = idx
+            self.kept.append((idx, timestamp))
+            yield frame
+
+    def _setup(self, frame):
+        d = self.downsample
+        shape = frame[::d, ::d].shape
+        self._small = np.empty(shape, np.float32)
+        self._step = np.empty(shape, np.float32)
+        self._background = np.empty(shape, np.float32)
+        np.copyto(self._background, frame[::d, ::d])
+        self._activeRun = 0
+
+    def _active(self, frame):
+        d = self.downsample
+        small, background = self._small, self._background
+        np.copyto(small, frame[::d, ::d])
+        np.subtract(small, background, out=small)
+        np.abs(small, out=self._step)
+        active = self._step.mean() > self.threshold
+
+        if not active:
+            # move the background towards idle frames only
+            self._activeRun = 0
+            np.multiply(small, self.alpha, out=small)
+            np.add(background, small, out=background)
+        else:
+            self._activeRun += 1
+            if self.relearnAfter is not None and \
+                    self._activeRun >= self.relearnAfter:
+                self._activeRun = 0
+                np.copyto(background, frame[::d, ::d])
+
+        return active
+
+    def save(self, filename, start=None):
+        """Writes the frame number and time of every kept frame to a file.
+
+        :param filename: string path of the csv file to write
+        :param start: float time of the first grabbed frame, times are saved
+                      relative to it, defaults to the first kept frame
+
+        :returns: None
+        """
+        if start is None:
+            start = self.kept[0][1] if self.kept else 0.0
+        with open(filename, "w") as f:
+            f.write("frame,time\n")
+            for idx, timestamp in self.kept:
+                f.write("%d,%.6f\n" % (idx, timestamp - start))
+
+    def report(self):
+        """Returns a dict with the number of frames seen and kept."""
+        kept = len(self.kept)
+        return {"frames": self.frames, "kept": kept,
+                "dropped": 1 - kept / self.frames if self.frames else 0.0}
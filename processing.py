@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import chain, count, islice
+import threading
+import numpy as np
+
+
+class CalibrationStage:
+    """Dark-frame, background and flat-field correction of frames.
+
+    Computes (frame - dark - background) * gain, where gain is the flat field
+    normalized to its mean, then rounds and clips the result to the output
+    range. The offset and gain arrays are precomputed once, and every worker
+    thread keeps its own float32 scratch frame, so correcting a frame
+    allocates no memory.
+
+    Parameters
+    -----------
+
+    dark
+      Dark frame, the mean of frames taken with the sensor covered, or None.
+
+    flat
+      Flat field, the mean of frames of an evenly lit target, or None. The
+      dark frame is subtracted from it before it is normalized.
+
+    background
+      Static background to remove from every frame, or None.
+
+    maxValue
+      Largest output value, defaults to the maximum of the output dtype. Use
+      4095 for 12-bit data stored in 16 bits.
+    """
+
+    def __init__(self, dark=None, flat=None, background=None, maxValue=None):
+        arrays = [a for a in (dark, flat, background) if a is not None]
+        if not arrays:
+            raise ValueError("no calibration arrays given")
+        shape = arrays[0].shape
+
+        self.offset = np.zeros(shape, np.float32)
+        if dark is not None:
+            self.offset += dark
+        if background is not None:
+            self.offset += background
+
+        self.gain = None
+        if flat is not None:
+            flat = np.asarray(flat, np.float32)
+            if dark is not None:
+                flat = flat - dark
+            flat[flat <= 0] = np.nan
+            self.gain = np.float32(np.nanmean(flat)) / flat
+            self.gain[np.isnan(self.gain)] = 1.0
+
+        self.maxValue = maxValue
+        self._local = threading.local()
+
+    @classmethod
+    def from_file(cls, filename, maxValue=None):
+        """Loads calibration arrays from a .npz file.
+
+        :param filename: string path of a .npz file with any of the arrays
+                         'dark', 'flat' and 'background'
+        :param maxValue: int largest output value, see the class docstring
+
+        :returns: CalibrationStage
+        """
+        with np.load(filename) as arrays:
+            return cls(arrays.get("dark"), arrays.get("flat"),
+                       arrays.get("background"), maxValue)
+
+    def apply(self, src, dst):
+        """Writes the corrected src frame into dst, which may be src."""
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = np.empty(self.offset.shape,
+                                                     np.float32)
+        maxValue = self.maxValue
+        if maxValue is None:
+            maxValue = np.iinfo(dst.dtype).max
+
+        np.subtract(src, self.offset, out=scratch)
+        if self.gain is not None:
+            np.multiply(scratch, self.gain, out=scratch)
+        np.rint(scratch, out=scratch)
+        np.clip(scratch, 0, maxValue, out=scratch)
+        np.copyto(dst, scratch, casting="unsafe")
+
+
+class BatchPipeline:
+    """Runs processing stages on batches of frames on a worker pool.
+
+    Frames are grouped into batches of 'batchSize', and every batch is
+    processed on one worker thread into a preallocated output buffer. The
+    first stage reads the incoming frame and writes the buffer slot, later
+    stages work on the slot in place. Processed frames are yielded in order as
+    views into the output buffers, which are reused once the consumer has
+    moved past them, so each frame must be written or copied before the next
+    one is requested.
+
+    A stage is any object with an 'apply(src, dst)' method that may be called
+    from several threads at once.
+
+    Parameters
+    -----------
+
+    stages
+      List of stages, applied to every frame in order.
+
+    batchSize
+      Number of frames handed to a worker at a time.
+
+    workers
+      Number of worker threads. One more output buffer than workers is
+      allocated, so the consumer can drain one batch while the workers fill
+      the others.
+    """
+
+    def __init__(self, stages, batchSize=8, workers=2):
+        self.stages = stages
+        self.batchSize = batchSize
+        self.workers = workers
+
+    def map(self, frames, shape=None, dtype=None):
+        """Processes frames and yields the results in order.
+
+        :param frames: iterable of numpy arrays
+        :param shape: tuple output frame shape, defaults to the input shape
+        :param dtype: numpy output dtype, defaults to the input dtype
+
+        :returns: generator of processed frames
+        """
+        frames = iter(frames)
+        first = next(frames, None)
+        if first is None:
+            return
+        frames = chain([first], frames)
+        if shape is None:
+            shape = first.shape
+        if dtype is None:
+            dtype = first.dtype
+
+        depth = self.workers + 1
+        slots = [np.empty((self.batchSize,) + tuple(shape), dtype)
+                 for _ in range(depth)]
+        pending = deque()
+        with ThreadPoolExecutor(self.workers) as pool:
+            for idx in count():
+                batch = list(islice(frames, self.batchSize))
+                if not batch:
+                    break
+                if len(pending) == depth:
+                    yield from self._drain(pending.popleft())
+                slot = slots[idx % depth]
+                pending.append((pool.submit(self._run, batch, slot), slot,
+                                len(batch)))
+            while pending:
+                yield from self._drain(pending.popleft())
+
+    def _run(self, batch, slot):
+        for frame, dst in zip(batch, slot):
+            src = frame
+            for stage in self.stages:
+                stage.apply(src, dst)
+                src = dst
+
+    @staticmethod
+    def _drain(pending):
+        future, slot, num = pending
+        future.result()
+        for idx in range(num):
+            yield slot[idx]
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import cv2
+import numpy as np
+
+# arrays a stereo calibration file has to contain
+CALIBRATION_KEYS = ("K1", "D1", "K2", "D2", "R", "T")
+
+
+def load_stereo_calibration(filename):
+    """Loads a stereo calibration of the two cameras.
+
+    The file is either a .npz file or an OpenCV FileStorage .yml/.xml file,
+    with camera matrices 'K1' and 'K2', distortion coefficients 'D1' and
+    'D2' and the rotation 'R' and translation 'T' from the first camera to the
+    second, as returned by cv2.stereoCalibrate on full sensor frames.
+
+    :param filename: string path of the calibration file
+
+    :returns: dict of calibration arrays, plus a 'hash' of the file contents
+    """
+    calib = {}
+    if filename.endswith(".npz"):
+        with np.load(filename) as arrays:
+            for key in CALIBRATION_KEYS:
+                calib[key] = arrays[key]
+    else:
+        fs = cv2.FileStorage(filename, cv2.FILE_STORAGE_READ)
+        for key in CALIBRATION_KEYS:
+            calib[key] = fs.getNode(key).mat()
+        fs.release()
+
+    with open(filename, "rb") as f:
+        calib["hash"] = hashlib.sha1(f.read()).hexdigest()
+
+    return calib
+
+
+def roi_camera_matrix(K, roi, sampling=None):
+    """Moves a full sensor camera matrix to what a camera reads out.
+
+    A binned pixel is centered on the pixels it combines, so binning by b
+    maps a full sensor coordinate x to (x - (b - 1) / 2) / b, and decimation
+    by d, which keeps every d-th pixel, maps it to x / d. As on Basler
+    cameras, binning comes before decimation and the ROI offset, counted in
+    pixels after both, comes last. Distortion coefficients work on
+    normalized coordinates and need no change.
+
+    :param K: 3x3 camera matrix calibrated on full sensor frames
+    :param roi: tuple (width, height, offsetX, offsetY) of the readout
+    :param sampling: tuple (binningX, binningY, decimationX, decimationY), or
+                     None for full resolution
+
+    :returns: 3x3 float64 camera matrix
+    """
+    K = np.array(K, np.float64)
+    binX, binY, decX, decY = sampling or (1, 1, 1, 1)
+    for row, binning, decimation, offset in ((0, binX, decX, roi[2]),
+                                             (1, binY, decY, roi[3])):
+        K[row, :2] /= binning * decimation
+        K[row, 2] = (K[row, 2] - (binning - 1) / 2) / binning / decimation \
+            - offset
+
+    return K
+
+
+def rectification_maps(calib, rois, cacheDir="rectification_cache",
+                       alpha=0.0, sampling=None):
+    """Returns fixed-point remap tables that rectify both cameras' frames.
+
+    The calibration is moved to each camera's ROI, binning and decimation,
+    see 'roi_camera_matrix', rectified with
+    cv2.stereoRectify and turned into cv2.CV_16SC2 lookup tables with
+    cv2.initUndistortRectifyMap, which cv2.remap applies faster than floating
+    point maps. Computing them takes a while for large frames, so the tables
+    are cached in 'cacheDir', keyed by the calibration file contents, the
+    ROIs, the sampling and 'alpha', and loaded from there on later runs.
+
+    :param calib: dict from 'load_stereo_calibration'
+    :param rois: list of two (width, height, offsetX, offsetY) tuples, the
+                 ROI each camera records; both need the same size
+    :param cacheDir: string directory to cache the tables in
+    :param alpha: float free scaling, 0 crops to valid pixels only and 1 keeps
+                  all source pixels, see cv2.stereoRectify
+    :param sampling: list of two (binningX, binningY, decimationX,
+                     decimationY) tuples, one per camera, or None for full
+                     resolution
+
+    :returns: list of two (map1, map2) tuples, one per camera
+    """
+    size = tuple(rois[0][:2])
+    if tuple(rois[1][:2]) != size:
+        raise ValueError("both cameras need the same ROI size to rectify, "
+                         "got %s and %s" % (size, tuple(rois[1][:2])))
+
+    if sampling is None:
+        sampling = [None, None]
+    key = hashlib.sha1(("%s %s %s %s" % (calib["hash"], rois, alpha,
+                                         sampling)).encode())
+    cacheFile = os.path.join(cacheDir, key.hexdigest() + ".npz")
+    if os.path.exists(cacheFile):
+        with np.load(cacheFile) as cached:
+            return [(cached["map1_0"], cached["map2_0"]),
+                    (cached["map1_1"], cached["map2_1"])]
+
+    K1 = roi_camera_matrix(calib["K1"], rois[0], sampling[0])
+    K2 = roi_camera_matrix(calib["K2"], rois[1], sampling[1])
+
+    T = calib["T"].astype(np.float64).reshape(3, 1)
+
+    R1, R2, P1, P2, _, _, _ = cv2.stereoRectify(
+        K1, calib["D1"], K2, calib["D2"], size, calib["R"], T, alpha=alpha)
+    maps = [cv2.initUndistortRectifyMap(K1, calib["D1"], R1, P1, size,
+                                        cv2.CV_16SC2),
+            cv2.initUndistortRectifyMap(K2, calib["D2"], R2, P2, size,
+                                        cv2.CV_16SC2)]
+
+    os.makedirs(cacheDir, exist_ok=True)
+    np.savez(cacheFile, map1_0=maps[0][0], map2_0=maps[0][1],
+             map1_1=maps[1][0], map2_1=maps[1][1])
+
+    return maps
+
+
+class RemapStage:
+    """Processing stage that rectifies frames with precomputed remap tables.
+
+    For use in a 'processing.BatchPipeline'. cv2.remap releases the GIL, so
+    frames are rectified in parallel on the pipeline's workers, and it writes
+    straight into the pipeline's reused output buffers.
+
+    Parameters
+    -----------
+
+    map1, map2
+      Fixed-point lookup tables of one camera from 'rectification_maps'.
+
+    interpolation
+      OpenCV interpolation flag, cv2.INTER_LINEAR by default.
+    """
+
+    def __init__(self, map1, map2, interpolation=cv2.INTER_LINEAR):
+        self.map1 = map1
+        self.map2 = map2
+        self.interpolation = interpolation
+        self._local = threading.local()
+
+    def apply(self, src, dst):
+        """Writes the rectified src frame into dst, which may be src."""
+        if src is dst:
+            # remap can not work in place, so read from a per-thread copy
+            scratch = getattr(self._local, "scratch", None)
+            if scratch is None or scratch.shape != src.shape or \
+                    scratch.dtype != src.dtype:
+                scratch = self._local.scratch = np.empty_like(src)
+            np.copyto(scratch, src)
+            src = scratch
+        cv2.remap(src, self.map1, self.map2, self.interpolation, dst=dst)
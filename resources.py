@@ -0,0 +1,160 @@
+import os
+from statistics import pstdev
+from time import perf_counter
+
+
+def plan_resources(numCams, cpus=None, grabCores=1, threadBudget=None):
+    """Splits the host's cores between camera grab threads and encoders.
+
+    Every camera gets 'grabCores' cores of its own for its grab thread, taken
+    from the start of the core list, and the remaining cores are split evenly
+    between the camera encoders. When there are not enough cores for that,
+    grab threads share the first cores and encoders get whatever is left, or
+    all cores as a last resort. The number of ffmpeg threads per encoder is
+    the size of its core set, or an even share of 'threadBudget' if given.
+
+    :param numCams: int number of cameras
+    :param cpus: list of int cores to use, defaults to all cores this process
+                 may run on
+    :param grabCores: int number of cores reserved for each grab thread
+    :param threadBudget: int total ffmpeg threads for the whole host, or None
+
+    :returns: list with one dict per camera holding the 'grab' and 'encode'
+              core sets and the ffmpeg 'threads' count, or None if the
+              platform does not support setting CPU affinity
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        print("CPU affinity is not supported on this platform")
+        return None
+
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0))
+
+    numGrab = numCams * grabCores
+    if len(cpus) - numGrab >= numCams:
+        grabCpus, encodeCpus = cpus[:numGrab], cpus[numGrab:]
+    elif len(cpus) > grabCores:
+        grabCpus, encodeCpus = cpus[:grabCores], cpus[grabCores:]
+    else:
+        grabCpus, encodeCpus = cpus, cpus
+
+    plan = []
+    share = max(len(encodeCpus) // numCams, 1)
+    for idx in range(numCams):
+        start = idx * grabCores % len(grabCpus)
+        grab = set(grabCpus[start:start + grabCores])
+        start = idx * share % len(encodeCpus)
+        encode = set(encodeCpus[start:start + share])
+        if threadBudget is None:
+            threads = len(encode)
+        else:
+            threads = max(threadBudget // numCams, 1)
+        plan.append({"grab": grab, "encode": encode, "threads": threads})
+
+    return plan
+
+
+def pin_current_thread(cpus):
+    """Restricts the calling thread, and processes it starts later, to cpus.
+
+    :param cpus: set of int cores
+
+    :returns: None
+    """
+    # on Linux pid 0 is the calling thread, not the whole process
+    os.sched_setaffinity(0, cpus)
+
+
+def thread_context_switches():
+    """Returns voluntary and involuntary context switches of this thread."""
+    switches = {}
+    with open("/proc/thread-self/status") as status:
+        for line in status:
+            if "ctxt_switches" in line:
+                key, value = line.split(":")
+                switches[key] = int(value)
+
+    return (switches.get("voluntary_ctxt_switches", 0),
+            switches.get("nonvoluntary_ctxt_switches", 0))
+
+
+def thread_children():
+    """Returns the pids of processes started by the calling thread."""
+    try:
+        with open("/proc/thread-self/children") as children:
+            return [int(pid) for pid in children.read().split()]
+    except OSError:
+        return []
+
+
+def process_cpu_time(pid):
+    """Returns user plus system CPU seconds used so far by a process."""
+    with open("/proc/%d/stat" % pid) as stat:
+        # the command name may contain spaces, fields start after it
+        fields = stat.read().rsplit(")", 1)[1].split()
+
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def encoder_usage(usage, start):
+    """Records affinity and CPU time of the calling thread's encoder.
+
+    Must be called from the thread that opened the video writer, before the
+    writer is closed, since the ffmpeg process is found as a child of it.
+
+    :param usage: dict, gets 'encodeAffinity', 'encodeCpuTime' and
+                  'encodeTime' entries
+    :param start: float performance counter time the encoding started at
+
+    :returns: None
+    """
+    usage["encodeTime"] = perf_counter() - start
+    for pid in thread_children():
+        try:
+            usage["encodeAffinity"] = os.sched_getaffinity(pid)
+            usage["encodeCpuTime"] = process_cpu_time(pid)
+        except OSError:  # encoder already exited
+            pass
+
+
+def resource_report(plan, usages, frameTimes, fps):
+    """Compares the resource plan with what happened during the recording.
+
+    For every camera this prints and returns the jitter of frame retrieval
+    intervals, the involuntary context switches of its grab thread, whether
+    its encoder stayed on the planned cores, and how many cores the encoder
+    kept busy on average compared with its thread budget.
+
+    :param plan: list of per camera dicts from 'plan_resources'
+    :param usages: list of per camera dicts filled in by 'camera_video'
+    :param frameTimes: list of one list of frame retrieval times per camera
+    :param fps: float frame rate in frames per second
+
+    :returns: list of dicts, one per camera
+    """
+    report = []
+    for idx, (cam, usage, times) in enumerate(zip(plan, usages, frameTimes)):
+        intervals = [1000 * (b - a) for a, b in zip(times, times[1:])]
+        stats = {
+            "jitter": pstdev(intervals) if intervals else 0.0,
+            "maxInterval": max(intervals) if intervals else 0.0,
+            "grabPreempted": usage.get("grabPreempted", 0),
+            "encodePinned": usage.get("encodeAffinity") == cam["encode"],
+            "encodeCores": 0.0,
+        }
+        if usage.get("encodeTime"):
+            stats["encodeCores"] = (usage.get("encodeCpuTime", 0.0) /
+                                    usage["encodeTime"])
+        report.append(stats)
+        print("camera %d: grab cores %s, encode cores %s, %d ffmpeg threads"
+              % (idx, sorted(cam["grab"]), sorted(cam["encode"]),
+                 cam["threads"]))
+        print("  frame interval jitter %.3f ms (max %.3f ms, nominal "
+              "%.3f ms), grab thread preempted %d times"
+              % (stats["jitter"], stats["maxInterval"], 1000 / fps,
+                 stats["grabPreempted"]))
+        print("  encoder %s planned cores, %.2f cores busy on average"
+              % ("stayed on" if stats["encodePinned"] else "left",
+                 stats["encodeCores"]))
+
+    return report
@@ -0,0 +1,321 @@
+from threading import Thread, Event
+from time import sleep, perf_counter
+import os
+import tempfile
+import tracemalloc
+import numpy as np
+from pypylon import pylon
+from two_basler_video import camera_video
+
+
+class _Feature:
+    """Stand-in for a camera feature, readable as node() or GetValue()."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+    def GetValue(self):
+        return self.value
+
+
+class _GrabResult:
+    """Stand-in for a pylon grab result holding one generated frame."""
+
+    def __init__(self, frame):
+        self.Array = frame
+
+    def GetBuffer(self):
+        return self.Array.tobytes()
+
+    def Release(self):
+        self.Array = None
+
+
+class SyntheticCamera:
+    """Generates frames in place of a Basler camera for 'camera_video'.
+
+    Provides the parts of the pylon camera interface that 'camera_video'
+    uses. Frames are a gradient that moves by one row per frame, delivered
+    on a monotonic deadline at 'fps', which can be far above what a real
+    sensor does to age the recording path faster. Like pylon, every
+    retrieved frame is a new array.
+
+    Parameters
+    -----------
+
+    height, width
+      Frame size in pixels.
+
+    fps
+      Frame rate in frames per second.
+    """
+
+    def __init__(self, height, width, fps):
+        self.Height = _Feature(height)
+        self.Width = _Feature(width)
+        self.PixelFormat = _Feature("Mono8")
+        self.fps = fps
+        self.frames = 0
+        self._pattern = np.tile(
+            (np.arange(2 * height) % 256).astype(np.uint8)[:, None],
+            (1, width))
+        self._remaining = 0
+
+    def StartGrabbingMax(self, numImages, strategy=None):
+        self._remaining = numImages
+        self._next = perf_counter()
+
+    def StopGrabbing(self):
+        self._remaining = 0
+
+    def IsGrabbing(self):
+        return self._remaining > 0
+
+    def RetrieveResult(self, timeout):
+        delay = self._next - perf_counter()
+        if delay > 0:
+            sleep(delay)
+        self._next += 1.0 / self.fps
+
+        row = self.frames % self.Height()
+        frame = self._pattern[row:row + self.Height()].copy()
+        self._remaining -= 1
+        self.frames += 1
+        return _GrabResult(frame)
+
+
+def rss_bytes():
+    """Returns the resident memory of this process in bytes."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+
+    return 0
+
+
+def open_fds():
+    """Returns the number of open file descriptors of this process."""
+    return len(os.listdir("/proc/self/fd"))
+
+
+def ffmpeg_children():
+    """Returns the number of ffmpeg processes started by this process."""
+    count = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open("/proc/%s/stat" % pid) as stat:
+                fields = stat.read()
+        except OSError:
+            continue
+        name, rest = fields[fields.index("(") + 1:].rsplit(")", 1)
+        if "ffmpeg" in name and int(rest.split()[1]) == os.getpid():
+            count += 1
+
+    return count
+
+
+def slope(xs, ys):
+    """Returns the least squares slope of ys over xs."""
+    if len(xs) < 2:
+        return 0.0
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    if not var:
+        return 0.0
+
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var
+
+
+def run_soak(duration, fps=200, size=(480, 640), numCams=2,
+             segmentFrames=2000, writer="FFMPEG", pixFormatVideo="gray",
+             interval=10.0, snapshotEvery=6, warmup=0.1,
+             maxMemorySlope=50.0, maxFpsDecay=0.05, outDir=None,
+             cameraKwargs=None, segmentKwargs=None):
+    """Records synthetic frames for a long time and checks for decay.
+
+    Runs 'camera_video' on 'numCams' threads with SyntheticCamera sources,
+    recording back to back segments of 'segmentFrames' frames and deleting
+    each file, and any frame list a gate saved next to it, when done, until
+    'duration' seconds have passed. The achieved frame rate of a segment is
+    its frame count over the time from starting it to its file being fully
+    encoded. Every 'interval' seconds the harness samples resident memory,
+    open file descriptors, running ffmpeg child processes and the latest
+    segment frame rate, and every 'snapshotEvery' samples it prints the top
+    tracemalloc allocators.
+
+    After the run, the first 'warmup' fraction of samples and segments is
+    ignored. The run fails if the memory slope fitted over the rest is above
+    'maxMemorySlope' MB per hour, if the mean frame rate of the last quarter
+    of segments is more than 'maxFpsDecay' below that of the first quarter,
+    or if ffmpeg processes or file descriptors were left behind. Pick 'fps'
+    and 'size' so that the encoders keep up, or every segment waits for its
+    backlog to drain.
+
+    :param duration: float seconds to run for
+    :param fps: float frame rate of each synthetic camera
+    :param size: tuple (height, width) of the frames
+    :param numCams: int number of cameras recording at once
+    :param segmentFrames: int frames per recorded file
+    :param writer: string video writer, 'imageio' or 'FFMPEG'
+    :param pixFormatVideo: string pixel format for the video writer
+    :param interval: float seconds between samples
+    :param snapshotEvery: int samples between tracemalloc reports
+    :param warmup: float fraction of the run left out of the checks
+    :param maxMemorySlope: float allowed memory growth in MB per hour
+    :param maxFpsDecay: float allowed relative frame rate drop
+    :param outDir: string directory for the segment files, a temporary
+                   directory if None
+    :param cameraKwargs: dict of further 'camera_video' keyword arguments,
+                         shared by all cameras and segments, so only for
+                         options without state such as memoryLimit
+    :param segmentKwargs: callable taking the camera index and the segment
+                          number and returning a dict of further
+                          'camera_video' keyword arguments for that segment,
+                          for options with state such as a new gate
+
+    :returns: dict with the samples and segment frame rates, the measured
+              'memorySlope' and 'fpsDecay', and 'failures', a list of failed
+              checks
+    """
+    if cameraKwargs is None:
+        cameraKwargs = {}
+    tmp = None
+    if outDir is None:
+        tmp = tempfile.TemporaryDirectory()
+        outDir = tmp.name
+
+    cams = [SyntheticCamera(size[0], size[1], fps) for _ in range(numCams)]
+    done = Event()
+    errors = []
+    segments = []
+
+    def record(idx):
+        segment = 0
+        try:
+            while not done.is_set():
+                fname = os.path.join(outDir, "soak%d_%d.avi" % (idx, segment))
+                kwargs = dict(cameraKwargs)
+                if segmentKwargs is not None:
+                    kwargs.update(segmentKwargs(idx, segment))
+                segmentStart = perf_counter()
+                camera_video(cams[idx], fname, segmentFrames, fps,
+                             pixFormatVideo, writer,
+                             pylon.GrabStrategy_OneByOne, **kwargs)
+                segments.append(segmentFrames /
+                                (perf_counter() - segmentStart))
+                os.remove(fname)
+                if os.path.exists(fname + ".frames.csv"):
+                    os.remove(fname + ".frames.csv")
+                segment += 1
+        except Exception as err:
+            errors.append(err)
+            done.set()
+
+    tracemalloc.start()
+    baseFds = open_fds()
+    threads = [Thread(target=record, args=(idx,)) for idx in range(numCams)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+
+    samples = []
+    while not done.wait(interval):
+        now = perf_counter()
+        sample = {"time": now - start, "rss": rss_bytes(), "fds": open_fds(),
+                  "ffmpeg": ffmpeg_children(),
+                  "fps": segments[-1] if segments else 0.0}
+        samples.append(sample)
+        print("%8.0f s  rss %7.1f MB  fds %4d  ffmpeg %d  segment fps %7.1f"
+              % (sample["time"], sample["rss"] / 1e6, sample["fds"],
+                 sample["ffmpeg"], sample["fps"]))
+
+        if len(samples) % snapshotEvery == 0:
+            top = tracemalloc.take_snapshot().statistics("lineno")[:5]
+            for stat in top:
+                print("          %s" % stat)
+        if now - start >= duration:
+            done.set()
+
+    for thread in threads:
+        thread.join()
+    tracemalloc.stop()
+    leftFfmpeg = ffmpeg_children()
+    leftFds = open_fds() - baseFds
+    if tmp is not None:
+        tmp.cleanup()
+
+    report = check_soak(samples, segments, warmup, maxMemorySlope,
+                        maxFpsDecay)
+    if errors:
+        report["failures"].append("recording failed: %r" % errors[0])
+    if leftFfmpeg:
+        report["failures"].append("%d ffmpeg processes left running" %
+                                  leftFfmpeg)
+    if leftFds > 0:
+        report["failures"].append("%d file descriptors left open" % leftFds)
+
+    print("memory slope %.1f MB/hour, fps decay %.1f%%" % (
+        report["memorySlope"], 100 * report["fpsDecay"]))
+    for failure in report["failures"]:
+        print("FAIL: %s" % failure)
+
+    return report
+
+
+def check_soak(samples, segments, warmup=0.1, maxMemorySlope=50.0,
+               maxFpsDecay=0.05):
+    """Fits memory growth and frame rate decay over a soak run.
+
+    :param samples: list of sample dicts with 'time' and 'rss'
+    :param segments: list of float achieved frame rates, one per segment
+    :param warmup: float fraction of samples and segments to leave out at
+                   the start
+    :param maxMemorySlope: float allowed memory growth in MB per hour
+    :param maxFpsDecay: float allowed relative frame rate drop
+
+    :returns: dict with 'samples', 'segments', 'memorySlope', 'fpsDecay' and
+              'failures'
+    """
+    steady = samples[int(len(samples) * warmup):]
+    memorySlope = slope([s["time"] for s in steady],
+                        [s["rss"] for s in steady]) * 3600 / 1e6
+
+    fpsDecay = 0.0
+    steadyFps = segments[int(len(segments) * warmup):]
+    quarter = len(steadyFps) // 4
+    if quarter:
+        first = sum(steadyFps[:quarter]) / quarter
+        last = sum(steadyFps[-quarter:]) / quarter
+        fpsDecay = 1 - last / first
+
+    failures = []
+    if memorySlope > maxMemorySlope:
+        failures.append("memory grows %.1f MB/hour, limit %.1f" %
+                        (memorySlope, maxMemorySlope))
+    if fpsDecay > maxFpsDecay:
+        failures.append("frame rate dropped %.1f%%, limit %.1f%%" %
+                        (100 * fpsDecay, 100 * maxFpsDecay))
+
+    return {"samples": samples, "segments": segments,
+            "memorySlope": memorySlope, "fpsDecay": fpsDecay,
+            "failures": failures}
+
+
+if __name__ == "__main__":
+    DURATION = 4 * 3600  # in seconds
+    FPS = 200  # per camera, well above the real cameras to age things faster
+    SIZE = (480, 640)  # frame height and width
+    SEGMENT_FRAMES = 20000  # frames per recorded file
+    MAX_MEMORY_SLOPE = 50.0  # in MB per hour
+    MAX_FPS_DECAY = 0.05  # fraction of the starting frame rate
+
+    report = run_soak(DURATION, FPS, SIZE, segmentFrames=SEGMENT_FRAMES,
+                      maxMemorySlope=MAX_MEMORY_SLOPE,
+                      maxFpsDecay=MAX_FPS_DECAY)
+    raise SystemExit(1 if report["failures"] else 0)
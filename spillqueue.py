@@ -0,0 +1,164 @@
+from collections import deque
+from threading import Condition
+from time import perf_counter
+import os
+import tempfile
+import numpy as np
+
+
+class SpillQueue:
+    """Frame queue that overflows to a file on local disk.
+
+    Frames are kept in memory while they take up less than 'memoryLimit'
+    bytes. Past that, new frames are appended to a raw spill file instead, and
+    they keep going there until the consumer has read every spilled frame
+    back, so frames always come out in the order they were put in. Putting a
+    frame never waits for the consumer and no frame is ever dropped. Once the
+    spill file has been drained completely it is truncated, so it only grows
+    while the consumer is behind.
+
+    Iterating over the queue yields frames until it is closed and empty.
+
+    Parameters
+    -----------
+
+    memoryLimit
+      Bytes of frames to keep in memory before spilling to disk, or None to
+      keep everything in memory.
+
+    spillDir
+      Directory for the spill file, the system temporary directory if None.
+    """
+
+    def __init__(self, memoryLimit=None, spillDir=None):
+        self.memoryLimit = memoryLimit
+        self.spillDir = spillDir
+        self._memory = deque()
+        self._memoryBytes = 0
+        self._spilled = deque()
+        self._cond = Condition()
+        self._closed = False
+
+        self._writer = self._reader = None
+        self._spillPath = None
+        self._writeOffset = 0
+        self._written = self._read = 0
+
+        self.stats = {"frames": 0, "spilledFrames": 0, "spilledBytes": 0,
+                      "peakMemoryBytes": 0, "peakSpillBytes": 0,
+                      "drainTime": 0.0}
+
+    def put(self, frame):
+        """Adds a frame at the end of the queue.
+
+        :param frame: numpy array, it is kept as is if it goes to memory
+
+        :returns: None
+        """
+        with self._cond:
+            # frames go to memory only while nothing spilled is left unread
+            toMemory = self._written == self._read and \
+                (self.memoryLimit is None or
+                 self._memoryBytes + frame.nbytes <= self.memoryLimit)
+            if toMemory:
+                self._memory.append(frame)
+                self._memoryBytes += frame.nbytes
+                self.stats["peakMemoryBytes"] = max(
+                    self.stats["peakMemoryBytes"], self._memoryBytes)
+            elif self._written == self._read:
+                # everything spilled so far has been read back, start over
+                self._open_spill()
+                self._writer.seek(0)
+                self._writer.truncate()
+                self._writeOffset = 0
+            self.stats["frames"] += 1
+
+        if not toMemory:
+            frame = np.ascontiguousarray(frame)
+            self._writer.write(frame.data)
+            self._writer.flush()
+            record = (self._writeOffset, frame.shape, frame.dtype)
+            self._writeOffset += frame.nbytes
+            self.stats["spilledFrames"] += 1
+            self.stats["spilledBytes"] += frame.nbytes
+            self.stats["peakSpillBytes"] = max(self.stats["peakSpillBytes"],
+                                               self._writeOffset)
+
+        with self._cond:
+            if not toMemory:
+                self._spilled.append(record)
+                self._written += 1
+            self._cond.notify()
+
+    def get(self):
+        """Removes and returns the frame at the front of the queue.
+
+        Waits for a frame if the queue is empty but not closed yet.
+
+        :returns: numpy array, or None once the queue is closed and empty
+        """
+        with self._cond:
+            while not self._memory and not self._spilled:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            if self._memory:
+                frame = self._memory.popleft()
+                self._memoryBytes -= frame.nbytes
+                return frame
+            offset, shape, dtype = self._spilled.popleft()
+
+        start = perf_counter()
+        frame = np.empty(shape, dtype)
+        view = memoryview(frame).cast("B")
+        pos = 0
+        while pos < len(view):
+            # reads on the unbuffered reader can come back short
+            self._reader.seek(offset + pos)
+            count = self._reader.readinto(view[pos:])
+            if not count:
+                raise IOError("spill file %s ended early" % self._spillPath)
+            pos += count
+        self.stats["drainTime"] += perf_counter() - start
+
+        with self._cond:
+            self._read += 1
+
+        return frame
+
+    def close(self):
+        """Marks the end of the frames, get returns None once drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def remove(self):
+        """Deletes the spill file, call after the queue has been drained."""
+        if self._writer is not None:
+            self._writer.close()
+            self._reader.close()
+            os.remove(self._spillPath)
+        self._writer = self._reader = None
+
+    def __iter__(self):
+        while True:
+            frame = self.get()
+            if frame is None:
+                return
+            yield frame
+
+    def _open_spill(self):
+        if self._writer is None:
+            fd, self._spillPath = tempfile.mkstemp(".spill", "frames",
+                                                   self.spillDir)
+            self._writer = os.fdopen(fd, "wb")
+            self._reader = open(self._spillPath, "rb", buffering=0)
+
+    def report(self):
+        """Returns spill statistics, including the drain rate in bytes/s."""
+        stats = dict(self.stats)
+        stats["drainRate"] = 0.0
+        if stats["drainTime"]:
+            stats["drainRate"] = stats["spilledBytes"] / stats["drainTime"]
+
+        return stats
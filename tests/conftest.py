@@ -0,0 +1,7 @@
+import os
+import sys
+
+# emulate two cameras for tests that open pylon, before pylon is loaded
+os.environ.setdefault("PYLON_CAMEMU", "2")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
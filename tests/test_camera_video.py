@@ -0,0 +1,167 @@
+import os
+import shutil
+import threading
+import pytest
+
+np = pytest.importorskip("numpy")
+pylon = pytest.importorskip("pypylon.pylon")
+pytest.importorskip("imageio")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg is not installed", allow_module_level=True)
+
+import two_basler_video  # noqa: E402
+from soak import SyntheticCamera, ffmpeg_children  # noqa: E402
+from framebus import FrameBusPublisher, FrameBusSubscriber  # noqa: E402
+from two_basler_video import camera_video, create_n_cameras, \
+    videos_from_two_cameras  # noqa: E402
+
+
+class FailingCamera(SyntheticCamera):
+    """SyntheticCamera whose grab fails on frame 'failAt'."""
+
+    def __init__(self, height, width, fps, failAt):
+        super().__init__(height, width, fps)
+        self.failAt = failAt
+
+    def RetrieveResult(self, timeout):
+        if self.frames == self.failAt:
+            raise RuntimeError("grab timed out")
+        return super().RetrieveResult(timeout)
+
+
+class PackedCamera(SyntheticCamera):
+    """SyntheticCamera that delivers Mono12p frames of 16 * value + 3."""
+
+    def __init__(self, height, width, fps):
+        super().__init__(height, width, fps)
+        self.PixelFormat.value = "Mono12p"
+
+    def RetrieveResult(self, timeout):
+        res = super().RetrieveResult(timeout)
+        pixels = res.Array.astype(np.uint16).reshape(-1, 2) * 16 + 3
+        a, b = pixels.T
+        res.Array = np.stack([a & 0xFF, (a >> 8) | ((b & 0xF) << 4), b >> 4],
+                             1).astype(np.uint8).ravel()
+        return res
+
+
+def run_in_thread(target, *args, **kwargs):
+    """Runs target on a daemon thread, returns (finished, exception)."""
+    result = {}
+
+    def run():
+        try:
+            target(*args, **kwargs)
+        except Exception as err:
+            result["error"] = err
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(30)
+    return not thread.is_alive(), result.get("error")
+
+
+def test_grab_failure_stops_encoder_and_cleans_up(tmp_path):
+    spillDir = tmp_path / "spill"
+    spillDir.mkdir()
+    cam = FailingCamera(48, 64, 200, failAt=10)
+    usage = {}
+    threadsBefore = threading.active_count()
+
+    finished, error = run_in_thread(
+        camera_video, cam, str(tmp_path / "video.avi"), 50, 200, "gray",
+        "FFMPEG", pylon.GrabStrategy_OneByOne, usage=usage,
+        memoryLimit=2 * 48 * 64, spillDir=str(spillDir))
+
+    assert finished, "camera_video hung after a failed grab"
+    assert isinstance(error, RuntimeError)
+    assert usage["spill"]["frames"] == 10
+    assert list(spillDir.iterdir()) == []
+    assert ffmpeg_children() == 0
+    assert threading.active_count() == threadsBefore
+
+
+def test_encoder_failure_stops_grabbing(tmp_path):
+    cam = SyntheticCamera(48, 64, 100)
+    usage = {}
+    threadsBefore = threading.active_count()
+
+    finished, error = run_in_thread(
+        camera_video, cam, str(tmp_path / "video.avi"), 500, 100, "gray",
+        "FFMPEG", pylon.GrabStrategy_OneByOne, usage=usage,
+        codec="nosuchcodec")
+
+    assert finished
+    assert isinstance(error, OSError)
+    # grabbing stopped soon after ffmpeg failed instead of running to the end
+    assert cam.frames < 100
+    assert usage["spill"]["frames"] == cam.frames
+    assert ffmpeg_children() == 0
+    assert threading.active_count() == threadsBefore
+
+
+def test_camera_thread_error_is_raised(tmp_path):
+    # the imageio writer can not take 12-bit frames, so both threads fail
+    finished, error = run_in_thread(
+        videos_from_two_cameras, str(tmp_path / "a.avi"),
+        str(tmp_path / "b.avi"), 0.5, "Mono12", 10000, 10, "gray", "imageio")
+
+    assert finished
+    assert isinstance(error, ValueError)
+
+
+def test_camera_thread_error_is_raised_when_triggered(tmp_path):
+    # the cameras never start grabbing, so the scheduler must give up
+    finished, error = run_in_thread(
+        videos_from_two_cameras, str(tmp_path / "a.avi"),
+        str(tmp_path / "b.avi"), 0.5, "Mono12", 10000, 10, "gray", "imageio",
+        triggered=True)
+
+    assert finished
+    assert isinstance(error, ValueError)
+
+
+def test_cameras_are_closed_when_setup_fails(tmp_path, monkeypatch):
+    created = []
+
+    def create(n):
+        created.append(create_n_cameras(n))
+        return created[-1]
+    monkeypatch.setattr(two_basler_video, "create_n_cameras", create)
+
+    # the emulated cameras can not decimate
+    with pytest.raises(ValueError, match="decimation"):
+        videos_from_two_cameras(
+            str(tmp_path / "a.avi"), str(tmp_path / "b.avi"), 0.5, "Mono8",
+            10000, 10, "gray", "FFMPEG", profile="decimate2")
+    assert not created[0].IsOpen()
+
+
+def test_correction_must_match_profile(tmp_path):
+    # full sensor correction arrays do not fit binned frames
+    for idx in range(2):
+        np.savez(tmp_path / ("cam%d.npz" % idx), dark=np.zeros((4, 4)))
+
+    with pytest.raises(ValueError, match="same profile"):
+        videos_from_two_cameras(
+            str(tmp_path / "a.avi"), str(tmp_path / "b.avi"), 0.5, "Mono8",
+            10000, 10, "gray", "FFMPEG", profile="bin2",
+            correctionFiles=[str(tmp_path / "cam0.npz"),
+                             str(tmp_path / "cam1.npz")])
+
+
+def test_packed_frames_are_published_unpacked(tmp_path):
+    name = "camera_video_test_%d" % os.getpid()
+    with FrameBusPublisher(name) as publisher:
+        finished, error = run_in_thread(
+            camera_video, PackedCamera(6, 8, 100), str(tmp_path / "v.mkv"), 5,
+            100, "gray16le", "FFMPEG", pylon.GrabStrategy_OneByOne,
+            publisher=publisher)
+        assert finished and error is None
+
+        with FrameBusSubscriber(name, timeout=1) as bus:
+            seq, _, frame = bus.latest()
+            assert frame.shape == (6, 8) and frame.dtype == np.uint16
+            # synthetic frames are a gradient moving one row per frame
+            expected = (np.arange(seq, seq + 6) % 256) * 16 + 3
+            assert np.array_equal(frame[:, 0], expected)
@@ -0,0 +1,68 @@
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from framebus import FrameBusPublisher, FrameBusSubscriber, \
+    FrameBusOverrun  # noqa: E402
+
+
+@pytest.fixture
+def name():
+    return "framebus_test_%d" % os.getpid()
+
+
+def frame(value):
+    return np.full((3, 5), value, np.uint16)
+
+
+def test_subscriber_sees_shape_dtype_and_frames(name):
+    with FrameBusPublisher(name, slots=4) as publisher:
+        publisher.publish(frame(1), 0.5)
+        with FrameBusSubscriber(name, timeout=1) as bus:
+            seq, timestamp, view = bus.next()
+            assert (seq, timestamp) == (0, 0.5)
+            assert view.shape == (3, 5) and view.dtype == np.uint16
+            assert int(view[0, 0]) == 1
+            assert bus.next(timeout=0.01) is None
+
+            publisher.publish(frame(2), 1.5)
+            seq, timestamp, view = bus.latest()
+            assert (seq, timestamp, int(view[0, 0])) == (1, 1.5, 2)
+
+
+def test_overwritten_frames_are_detected(name):
+    with FrameBusPublisher(name, slots=4) as publisher:
+        publisher.publish(frame(0))
+        with FrameBusSubscriber(name, timeout=1) as bus:
+            seq, _, _ = bus.next()
+            for value in range(1, 10):
+                publisher.publish(frame(value))
+            assert not bus.valid(seq)
+
+            with pytest.raises(FrameBusOverrun) as overrun:
+                bus.next()
+            assert overrun.value.missed > 0
+            # reading goes on from the oldest frame still in the ring
+            seq, _, view = bus.next()
+            assert bus.valid(seq)
+            assert int(view[0, 0]) == seq
+
+
+def test_late_subscriber_starts_at_newest_frame(name):
+    with FrameBusPublisher(name, slots=4) as publisher:
+        for value in range(200):
+            publisher.publish(frame(value))
+        with FrameBusSubscriber(name, timeout=1) as bus:
+            seq, _, view = bus.next()
+            assert (seq, int(view[0, 0])) == (199, 199)
+            assert bus.missed == 0
+
+            publisher.publish(frame(200))
+            seq, _, view = bus.next()
+            assert (seq, int(view[0, 0])) == (200, 200)
+
+
+def test_subscriber_times_out_without_publisher(name):
+    with pytest.raises(FileNotFoundError):
+        FrameBusSubscriber(name, timeout=0.05)
@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from gating import ActivityGate  # noqa: E402
+
+
+def scene(values):
+    return [np.full((32, 32), value, np.uint8) for value in values]
+
+
+def kept(gate, frames):
+    times = [0.1 * idx for idx in range(len(frames))]
+    values = [int(frame[0, 0]) for frame in gate.filter(frames, times)]
+    return [idx for idx, _ in gate.kept], values
+
+
+def test_post_roll_ends_when_activity_ends():
+    gate = ActivityGate(2, preRoll=3, postRoll=4, keepAlive=50)
+    frames = scene([100 if 50 <= idx < 53 else 10 for idx in range(200)])
+    idxs, values = kept(gate, frames)
+
+    # keep-alive, pre-roll, the event, post-roll, then keep-alive again
+    assert idxs == [0] + list(range(47, 57)) + [106, 156]
+    assert values == [int(frames[idx][0, 0]) for idx in idxs]
+
+
+def test_lasting_change_is_relearned():
+    gate = ActivityGate(2, preRoll=0, postRoll=0, keepAlive=None,
+                        relearnAfter=30)
+    idxs, _ = kept(gate, scene([100 if idx >= 50 else 10
+                                for idx in range(200)]))
+    assert idxs == list(range(50, 80))
+
+
+def test_report_and_save(tmp_path):
+    gate = ActivityGate(2, preRoll=1, postRoll=1, keepAlive=None)
+    kept(gate, scene([10, 10, 10, 100, 10, 10]))
+    assert [idx for idx, _ in gate.kept] == [2, 3, 4]
+    assert gate.report() == {"frames": 6, "kept": 3, "dropped": 0.5}
+
+    gate.save(str(tmp_path / "frames.csv"), start=0.1)
+    lines = (tmp_path / "frames.csv").read_text().splitlines()
+    assert lines == ["frame,time", "2,0.100000", "3,0.200000",
+                     "4,0.300000"]
@@ -0,0 +1,64 @@
+import threading
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from processing import CalibrationStage, BatchPipeline  # noqa: E402
+
+
+def test_calibration_stage_corrects_and_clips():
+    dark = np.full((2, 2), 10.0)
+    flat = np.array([[110.0, 110.0], [60.0, 10.0]])  # 100, 100, 50, <= 0
+    stage = CalibrationStage(dark=dark, flat=flat, maxValue=255)
+    src = np.array([[60, 5], [60, 200]], np.uint8)
+    dst = np.empty_like(src)
+    stage.apply(src, dst)
+
+    # gain is the dark-corrected flat over its mean of 250 / 3
+    gain = (250 / 3) / np.array([[100.0, 100.0], [50.0, np.nan]])
+    assert dst[0, 0] == round(50 * gain[0, 0])
+    assert dst[0, 1] == 0  # below the dark level
+    assert dst[1, 0] == round(50 * gain[1, 0])
+    assert dst[1, 1] == 190  # dead flat pixels keep a gain of 1
+
+
+def test_calibration_stage_in_place_and_max_value(tmp_path):
+    np.savez(tmp_path / "cal.npz", background=np.full((2, 3), -5000.0))
+    stage = CalibrationStage.from_file(str(tmp_path / "cal.npz"), 4095)
+    frame = np.full((2, 3), 100, np.uint16)
+    stage.apply(frame, frame)
+    assert (frame == 4095).all()
+
+    with pytest.raises(ValueError):
+        CalibrationStage()
+
+
+class AddIndex:
+    """Stage that records its threads and adds 1 to every frame."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def apply(self, src, dst):
+        self.threads.add(threading.get_ident())
+        np.add(src.reshape(dst.shape), 1, out=dst, casting="unsafe")
+
+
+def test_pipeline_keeps_order_across_batches():
+    stage = AddIndex()
+    pipeline = BatchPipeline([stage, stage], batchSize=3, workers=2)
+    frames = (np.full((2, 2), i, np.int32) for i in range(20))
+    out = [int(f[0, 0]) for f in pipeline.map(frames)]
+
+    assert out == [i + 2 for i in range(20)]
+    assert threading.get_ident() not in stage.threads
+
+
+def test_pipeline_output_shape_and_dtype():
+    pipeline = BatchPipeline([AddIndex()], batchSize=4)
+    frames = [np.zeros(6, np.uint8) for _ in range(5)]
+    out = [np.copy(f) for f in pipeline.map(frames, (2, 3), np.uint16)]
+    assert len(out) == 5
+    assert out[0].shape == (2, 3) and out[0].dtype == np.uint16
+    assert all((f == 1).all() for f in out)
+    assert list(pipeline.map([])) == []
@@ -0,0 +1,74 @@
+import shutil
+import subprocess
+import pytest
+
+np = pytest.importorskip("numpy")
+pylon = pytest.importorskip("pypylon.pylon")
+genicam = pytest.importorskip("pypylon.genicam")
+pytest.importorskip("imageio")
+
+from FFMPEGwriter import FFMPEGVideoWriter  # noqa: E402
+from two_basler_video import apply_acquisition_profile, \
+    profile_bandwidth  # noqa: E402
+
+
+@pytest.fixture
+def cam():
+    # an emulated camera, see conftest.py
+    factory = pylon.TlFactory.GetInstance()
+    cam = pylon.InstantCamera(factory.CreateFirstDevice())
+    cam.Open()
+    yield cam
+    cam.Close()
+
+
+def test_center_half_roi(cam):
+    cam.OffsetX.SetValue(0)
+    cam.OffsetY.SetValue(0)
+    maxWidth, maxHeight = cam.Width.Max, cam.Height.Max
+    width, height, offsetX, offsetY = apply_acquisition_profile(
+        cam, "center-half")
+
+    assert width == maxWidth // 2 - maxWidth // 2 % 2
+    assert height == maxHeight // 2 - maxHeight // 2 % 2
+    assert (cam.Width(), cam.Height()) == (width, height)
+    # centered in what is left
+    assert (cam.OffsetX(), cam.OffsetY()) == (offsetX, offsetY)
+    assert abs(2 * offsetX + width - maxWidth) <= 2 * cam.OffsetX.Inc
+    assert abs(2 * offsetY + height - maxHeight) <= 2 * cam.OffsetY.Inc
+
+
+def test_explicit_roi_is_rounded_to_even_sizes(cam):
+    width, height, offsetX, offsetY = apply_acquisition_profile(
+        cam, {"roi": (101, 51), "offset": (8, 4)})
+    assert width % 2 == 0 and height % 2 == 0
+    assert width <= 101 and height <= 51
+    assert (offsetX, offsetY) == (8, 4)
+
+
+def test_missing_feature_raises(cam):
+    if genicam.IsWritable(cam.GetNodeMap().GetNode("DecimationHorizontal")):
+        pytest.skip("camera supports decimation")
+    with pytest.raises(ValueError):
+        apply_acquisition_profile(cam, "decimate2")
+
+
+def test_profile_bandwidth(cam):
+    apply_acquisition_profile(cam, "center-quarter")
+    stats = profile_bandwidth(cam, 10, linkBandwidth=1e9)
+    assert stats["bandwidth"] == cam.PayloadSize() * 10
+    assert stats["bandwidth"] < stats["fullBandwidth"]
+    assert stats["camerasPerLink"] == int(1e9 // stats["bandwidth"])
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None,
+                    reason="ffmpeg is not installed")
+def test_odd_frame_sizes_are_padded_for_libx264(tmp_path):
+    fname = str(tmp_path / "odd.mkv")
+    with FFMPEGVideoWriter(fname, (21, 33), fps=10, pixfmt="gray") as writer:
+        for value in range(5):
+            writer.write_frame(np.full((21, 33), value, np.uint8))
+
+    probe = subprocess.run(["ffmpeg", "-hide_banner", "-i", fname],
+                           capture_output=True, text=True).stderr
+    assert "34x22" in probe
@@ -0,0 +1,98 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from rectification import load_stereo_calibration, roi_camera_matrix, \
+    rectification_maps, RemapStage  # noqa: E402
+
+K = np.array([[100.0, 0.0, 33.0], [0.0, 110.0, 25.0], [0.0, 0.0, 1.0]])
+
+
+def calibration():
+    return {"K1": K, "D1": np.array([0.05, -0.01, 0.0, 0.0, 0.0]),
+            "K2": K, "D2": np.zeros(5),
+            "R": cv2.Rodrigues(np.array([0.0, 0.02, 0.0]))[0],
+            "T": np.array([-1.0, 0.0, 0.0]), "hash": "test"}
+
+
+def project(K, point):
+    x = K @ point
+    return x[:2] / x[2]
+
+
+def test_roi_camera_matrix_follows_sampling_and_offset():
+    point = np.array([0.3, -0.2, 2.0])
+    x, y = project(K, point)
+    # binned by 2, decimated by 2 horizontally, then offset by (3, 1)
+    moved = roi_camera_matrix(K, (10, 10, 3, 1), (2, 2, 2, 1))
+
+    expected = ((x - 0.5) / 2 / 2 - 3, (y - 0.5) / 2 - 1)
+    assert np.allclose(project(moved, point), expected)
+
+
+def test_binned_maps_match_full_resolution_maps(tmp_path):
+    calib = calibration()
+    full = rectification_maps(calib, [(64, 48, 0, 0)] * 2, str(tmp_path))
+    binned = rectification_maps(calib, [(32, 24, 0, 0)] * 2, str(tmp_path),
+                                sampling=[(2, 2, 1, 1)] * 2)
+
+    for fullMaps, binnedMaps in zip(full, binned):
+        fullX, fullY = cv2.convertMaps(*fullMaps, cv2.CV_32FC1)
+        binX, binY = cv2.convertMaps(*binnedMaps, cv2.CV_32FC1)
+        # binned pixel (u, v) is centered on full pixel (2u + 0.5, 2v + 0.5)
+        for fullMap, binMap in ((fullX, binX), (fullY, binY)):
+            centered = (fullMap[0::2, 0::2] + fullMap[0::2, 1::2] +
+                        fullMap[1::2, 0::2] + fullMap[1::2, 1::2]) / 4
+            inside = (slice(2, -2), slice(2, -2))
+            assert np.abs((centered - 0.5) / 2 - binMap)[inside].max() < 0.1
+
+
+def test_maps_are_cached_per_sampling(tmp_path):
+    calib = calibration()
+    rois = [(32, 24, 0, 0)] * 2
+    first = rectification_maps(calib, rois, str(tmp_path))
+    binned = rectification_maps(calib, rois, str(tmp_path),
+                                sampling=[(2, 2, 1, 1)] * 2)
+    assert len(list(tmp_path.iterdir())) == 2
+
+    again = rectification_maps(calib, rois, str(tmp_path))
+    assert np.array_equal(first[0][0], again[0][0])
+    assert not np.array_equal(first[0][0], binned[0][0])
+
+
+def test_load_stereo_calibration_npz_and_yml(tmp_path):
+    calib = calibration()
+    arrays = {key: calib[key] for key in ("K1", "D1", "K2", "D2", "R", "T")}
+    np.savez(tmp_path / "calib.npz", **arrays)
+    fs = cv2.FileStorage(str(tmp_path / "calib.yml"), cv2.FILE_STORAGE_WRITE)
+    for key, value in arrays.items():
+        fs.write(key, value)
+    fs.release()
+
+    fromNpz = load_stereo_calibration(str(tmp_path / "calib.npz"))
+    fromYml = load_stereo_calibration(str(tmp_path / "calib.yml"))
+    for key, value in arrays.items():
+        assert np.allclose(fromNpz[key], value)
+        assert np.allclose(fromYml[key].ravel(), value.ravel())
+    assert fromNpz["hash"] != fromYml["hash"]
+
+
+def test_remap_stage_in_place_matches_remap(tmp_path):
+    (map1, map2), _ = rectification_maps(calibration(),
+                                         [(32, 24, 0, 0)] * 2, str(tmp_path))
+    stage = RemapStage(map1, map2)
+    frame = np.random.default_rng(0).integers(0, 256, (24, 32), np.uint8)
+    expected = cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+    dst = np.empty_like(frame)
+    stage.apply(frame, dst)
+    assert np.array_equal(dst, expected)
+    stage.apply(frame, frame)
+    assert np.array_equal(frame, expected)
+
+
+def test_rois_must_match(tmp_path):
+    with pytest.raises(ValueError):
+        rectification_maps(calibration(), [(32, 24, 0, 0), (30, 24, 0, 0)],
+                           str(tmp_path))
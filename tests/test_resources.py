@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+from threading import Thread
+import pytest
+
+from resources import plan_resources, pin_current_thread, thread_children, \
+    process_cpu_time, resource_report
+
+linux = pytest.mark.skipif(not hasattr(os, "sched_setaffinity"),
+                           reason="needs Linux CPU affinity")
+
+
+@linux
+def test_plan_gives_grab_threads_and_encoders_their_own_cores():
+    plan = plan_resources(2, cpus=list(range(8)))
+    assert [cam["grab"] for cam in plan] == [{0}, {1}]
+    assert [cam["encode"] for cam in plan] == [{2, 3, 4}, {5, 6, 7}]
+    assert [cam["threads"] for cam in plan] == [3, 3]
+
+    budget = plan_resources(2, cpus=list(range(8)), threadBudget=4)
+    assert [cam["threads"] for cam in budget] == [2, 2]
+
+
+@linux
+def test_plan_shares_cores_when_short():
+    plan = plan_resources(2, cpus=[0, 1, 2])
+    assert [cam["grab"] for cam in plan] == [{0}, {0}]
+    assert [cam["encode"] for cam in plan] == [{1}, {2}]
+
+    single = plan_resources(2, cpus=[0])
+    assert all(cam["grab"] == cam["encode"] == {0} for cam in single)
+
+
+@linux
+def test_pinned_thread_passes_affinity_to_children():
+    cpus = {min(os.sched_getaffinity(0))}
+    result = {}
+
+    def run():
+        pin_current_thread(cpus)
+        child = subprocess.Popen([sys.executable, "-c",
+                                  "import time; time.sleep(1)"])
+        try:
+            result["children"] = thread_children()
+            result["affinity"] = os.sched_getaffinity(child.pid)
+            result["cpuTime"] = process_cpu_time(child.pid)
+        finally:
+            child.kill()
+            child.wait()
+        result["pid"] = child.pid
+
+    thread = Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert result["affinity"] == cpus
+    assert result["pid"] in result["children"]
+    assert result["cpuTime"] >= 0.0
+    # pinning one thread leaves the rest of the process alone
+    assert len(os.sched_getaffinity(0)) >= len(cpus)
+
+
+def test_resource_report():
+    plan = [{"grab": {0}, "encode": {1, 2}, "threads": 2}]
+    usage = {"grabPreempted": 3, "encodeAffinity": {1, 2},
+             "encodeCpuTime": 3.0, "encodeTime": 2.0}
+    times = [0.0, 0.1, 0.2, 0.3]
+
+    stats, = resource_report(plan, [usage], [times], 10)
+    assert stats["jitter"] == pytest.approx(0.0, abs=1e-9)
+    assert stats["maxInterval"] == pytest.approx(100.0)
+    assert stats["grabPreempted"] == 3
+    assert stats["encodePinned"]
+    assert stats["encodeCores"] == pytest.approx(1.5)
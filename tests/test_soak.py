@@ -0,0 +1,58 @@
+import shutil
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pypylon")
+pytest.importorskip("imageio")
+
+from soak import check_soak, run_soak, slope  # noqa: E402
+from gating import ActivityGate  # noqa: E402
+
+
+def samples(rss):
+    return [{"time": 10.0 * i, "rss": value} for i, value in enumerate(rss)]
+
+
+def test_slope():
+    assert slope([0, 1, 2], [1, 3, 5]) == pytest.approx(2.0)
+    assert slope([1], [5]) == 0.0
+
+
+def test_check_soak_flags_memory_growth_after_warmup():
+    # 1 MB per 10 s sample is 360 MB per hour, the jump at the start is warmup
+    growing = samples([0, 50e6] + [50e6 + 1e6 * i for i in range(18)])
+    report = check_soak(growing, [], warmup=0.1, maxMemorySlope=50.0)
+    assert report["memorySlope"] == pytest.approx(360.0)
+    assert len(report["failures"]) == 1
+
+    flat = samples([0, 50e6] + [50e6] * 18)
+    assert check_soak(flat, [], warmup=0.1)["failures"] == []
+
+
+def test_check_soak_flags_frame_rate_decay():
+    segments = [100.0] * 8 + [90.0] * 4
+    report = check_soak(samples([0] * 4), segments, warmup=0.0,
+                        maxFpsDecay=0.05)
+    assert report["fpsDecay"] == pytest.approx(0.1)
+    assert len(report["failures"]) == 1
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None,
+                    reason="ffmpeg is not installed")
+def test_segment_kwargs_are_built_per_camera_and_segment(tmp_path):
+    gates = {}
+
+    def segmentKwargs(idx, segment):
+        gates[idx, segment] = ActivityGate(1.0)
+        return {"gate": gates[idx, segment]}
+
+    report = run_soak(3, fps=100, size=(24, 32), segmentFrames=50,
+                      interval=0.5, outDir=str(tmp_path),
+                      segmentKwargs=segmentKwargs)
+
+    assert {idx for idx, _ in gates} == {0, 1}
+    assert len(report["segments"]) >= 2
+    for gate in gates.values():
+        assert gate.frames <= 50
+    # videos and gate frame lists are removed after every segment
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,71 @@
+import os
+from threading import Thread
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from spillqueue import SpillQueue  # noqa: E402
+
+
+def frame(value, shape=(4, 6)):
+    return np.full(shape, value, np.uint16)
+
+
+def test_frames_come_out_in_order_across_memory_and_disk(tmp_path):
+    # room for two frames in memory, the rest has to spill
+    queue = SpillQueue(2 * frame(0).nbytes, str(tmp_path))
+    for value in range(10):
+        queue.put(frame(value))
+    queue.close()
+
+    values = [int(f[0, 0]) for f in queue]
+    assert values == list(range(10))
+    stats = queue.report()
+    assert stats["frames"] == 10
+    assert stats["spilledFrames"] == 8
+    assert stats["spilledBytes"] == 8 * frame(0).nbytes
+
+
+def test_back_in_memory_once_spill_is_drained(tmp_path):
+    queue = SpillQueue(frame(0).nbytes, str(tmp_path))
+    queue.put(frame(0))
+    queue.put(frame(1))  # spilled
+    assert int(queue.get()[0, 0]) == 0
+    assert int(queue.get()[0, 0]) == 1
+
+    queue.put(frame(2))
+    assert queue.report()["spilledFrames"] == 1
+    assert int(queue.get()[0, 0]) == 2
+
+
+def test_spill_file_is_truncated_and_removed(tmp_path):
+    queue = SpillQueue(frame(0).nbytes, str(tmp_path))
+    queue.put(frame(0))
+    for value in range(1, 4):
+        queue.put(frame(value))
+    for _ in range(4):
+        queue.get()
+    # spilling again starts over at the beginning of the file
+    queue.put(frame(4))
+    queue.put(frame(5))
+    path, = [os.path.join(tmp_path, f) for f in os.listdir(tmp_path)]
+    assert os.path.getsize(path) == frame(0).nbytes
+
+    queue.close()
+    list(queue)
+    queue.remove()
+    assert os.listdir(tmp_path) == []
+
+
+def test_get_waits_for_put_and_close():
+    queue = SpillQueue()
+    got = []
+    consumer = Thread(target=lambda: got.extend(queue))
+    consumer.start()
+    queue.put(frame(7))
+    queue.close()
+    consumer.join(5)
+
+    assert not consumer.is_alive()
+    assert [int(f[0, 0]) for f in got] == [7]
+    assert queue.get() is None
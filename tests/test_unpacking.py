@@ -0,0 +1,87 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from unpacking import unpack_mono12p, unpack_mono12packed, \
+    _unpack_mono12p_bytes, _views, Mono12Unpacker, bit_depth, \
+    max_pixel_value, is_high_bit_depth  # noqa: E402
+
+
+def pack_mono12p(pixels):
+    """Packs 12-bit pixels as Mono12p, least significant bits first."""
+    a, b = pixels.reshape(-1, 2).T.astype(np.uint16)
+    return np.stack([a & 0xFF, (a >> 8) | ((b & 0xF) << 4), b >> 4],
+                    1).astype(np.uint8).ravel()
+
+
+def pack_mono12packed(pixels):
+    """Packs 12-bit pixels as Basler Mono12Packed."""
+    a, b = pixels.reshape(-1, 2).T.astype(np.uint16)
+    return np.stack([a >> 4, (a & 0xF) | ((b & 0xF) << 4), b >> 4],
+                    1).astype(np.uint8).ravel()
+
+
+@pytest.fixture
+def pixels():
+    return np.random.default_rng(0).integers(0, 4096, (6, 10), np.uint16)
+
+
+@pytest.mark.parametrize("unpack, pack", [
+    (unpack_mono12p, pack_mono12p),
+    (unpack_mono12packed, pack_mono12packed),
+])
+def test_unpack_round_trip(pixels, unpack, pack):
+    out = np.empty_like(pixels)
+    assert unpack(pack(pixels), out) is out
+    assert np.array_equal(out, pixels)
+
+    # reused scratch and extreme values
+    extremes = np.tile(np.array([0, 4095], np.uint16), 30).reshape(6, 10)
+    scratch = np.empty(30, np.uint32)
+    unpack(pack(extremes), out, scratch)
+    assert np.array_equal(out, extremes)
+
+
+def test_mono12p_byte_path_matches(pixels):
+    out = np.zeros_like(pixels)
+    triplets, pairs, _ = _views(pack_mono12p(pixels), out, None, np.uint32)
+    _unpack_mono12p_bytes(triplets, pairs, out)
+    assert np.array_equal(out, pixels)
+
+
+def test_unpack_rejects_wrong_size(pixels):
+    with pytest.raises(ValueError):
+        unpack_mono12p(pack_mono12p(pixels), np.empty((5, 10), np.uint16))
+
+
+def test_unpacker_call_and_apply(pixels):
+    unpacker = Mono12Unpacker(6, 10, "Mono12Packed")
+    packed = pack_mono12packed(pixels)
+    assert np.array_equal(unpacker(packed), pixels)
+    assert unpacker(packed) is unpacker.out
+
+    dst = np.empty_like(pixels)
+    unpacker.apply(packed, dst)
+    assert np.array_equal(dst, pixels)
+
+
+def test_is_high_bit_depth():
+    assert is_high_bit_depth("Mono12p")
+    assert is_high_bit_depth("BayerRG10")
+    assert is_high_bit_depth("Mono16")
+    assert not is_high_bit_depth("Mono8")
+    assert not is_high_bit_depth("YUV422_8")
+
+
+@pytest.mark.parametrize("pixFormatCam, depth, maxValue", [
+    ("Mono8", 8, None),
+    ("BayerRG8", 8, None),
+    ("Mono10", 10, 1023),
+    ("BayerRG10", 10, 1023),
+    ("Mono12p", 12, 4095),
+    ("Mono12Packed", 12, 4095),
+    ("Mono16", 16, None),
+])
+def test_bit_depth_and_max_pixel_value(pixFormatCam, depth, maxValue):
+    assert bit_depth(pixFormatCam) == depth
+    assert max_pixel_value(pixFormatCam) == maxValue
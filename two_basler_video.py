@@ -1,12 +1,51 @@
 from threading import Thread
-from time import sleep
+from time import sleep, perf_counter
+from statistics import mean, pstdev
 from pypylon import pylon
+from pypylon import genicam
+import numpy as np
 import imageio as iio
 from FFMPEGwriter import FFMPEGVideoWriter
+from framebus import FrameBusPublisher
+from resources import plan_resources, pin_current_thread, \
+    thread_context_switches, encoder_usage, resource_report
+from unpacking import PACKED_FORMATS, Mono12Unpacker, is_high_bit_depth, \
+    max_pixel_value
+from processing import BatchPipeline, CalibrationStage
+from gating import ActivityGate
+from spillqueue import SpillQueue
+from rectification import load_stereo_calibration, rectification_maps, \
+    RemapStage
+
+
+# Named acquisition profiles for 'apply_acquisition_profile'. 'roi' is the
+# (width, height) to read out after binning and decimation, either in pixels
+# or as fractions of the available area, None for all of it. 'offset' is the
+# (x, y) of its top left corner, None to center it. 'binning' and
+# 'decimation' are applied in both directions.
+ACQUISITION_PROFILES = {
+    "full": {},
+    "center-half": {"roi": (0.5, 0.5)},
+    "center-quarter": {"roi": (0.25, 0.25)},
+    "bin2": {"binning": 2},
+    "bin2-center-half": {"binning": 2, "roi": (0.5, 0.5)},
+    "decimate2": {"decimation": 2},
+}
+
+# usable link bandwidth in bytes per second, by pylon device class
+LINK_BANDWIDTH = {
+    "BaslerUsb": 380e6,
+    "BaslerGigE": 118e6,
+}
 
 
 def videos_from_two_cameras(filename1, filename2, recordTime, pixFormatCam,
-                            camExposure, fps, pixFormatVideo, writer):
+                            camExposure, fps, pixFormatVideo, writer,
+                            triggered=False, busNames=None,
+                            planResources=False, threadBudget=None,
+                            correctionFiles=None, gating=None,
+                            stereoCalibration=None, memoryLimit=None,
+                            spillDir=None, profile=None):
     """Shoot and save simultaneous video from two Basler cameras.
 
     Creates and opens a two camera array, sets imaging parameters on both
@@ -17,6 +56,51 @@ def videos_from_two_cameras(filename1, filename2, recordTime, pixFormatCam,
     'writer' argument - 'imageio' is the writer from python imageio library and
     'FFMPEG' is the writer from issue #113 on pypylon GitHub repository.
 
+    With 'triggered' set, the cameras are put in software trigger mode instead
+    of free-run and a third thread fires one trigger on every camera per frame
+    period, so that exposures on both cameras start together. The measured
+    trigger-to-frame latency and the spread between cameras are printed and
+    returned.
+
+    With 'busNames' given, every grabbed frame of a camera is also published
+    to a shared-memory ring of that name, where other processes on the host
+    can read the live stream with a FrameBusSubscriber from 'framebus'.
+
+    With 'planResources' set on Linux, each camera's grab thread and ffmpeg
+    encoder are pinned to their own cores and the encoder thread count is set
+    from 'threadBudget', see 'plan_resources'. How well the plan held up is
+    printed and returned after the recording.
+
+    With 'correctionFiles' given, dark-frame, background and flat-field
+    correction is applied to every frame before it is encoded, see
+    'processing.CalibrationStage'. The arrays have to match the frame size the
+    cameras record with, including any 'profile'.
+
+    With 'gating' given, frames of a static scene are dropped before encoding
+    except for sparse keep-alive frames and some frames around activity, see
+    'gating.ActivityGate'. The frame number and time of each kept frame are
+    saved next to the video as <filename>.frames.csv.
+
+    With 'stereoCalibration' given, both videos are rectified while recording.
+    Remap tables for the cameras' ROIs are computed once and cached on disk,
+    see 'rectification.rectification_maps', and applied after any correction.
+    The calibration is taken on full sensor frames and is moved to the ROI,
+    binning and decimation of each camera.
+
+    Each camera's frames are queued in memory for its encoder up to
+    'memoryLimit' bytes, and overflow to a spill file in 'spillDir' past that.
+    How much was spilled and how fast it drained is printed and returned.
+
+    With 'profile' given, ROI, binning and decimation are set on both cameras
+    before recording, see 'apply_acquisition_profile', so only the pixels
+    that are needed are transferred and encoded. The resulting link
+    bandwidth of each camera is printed and returned.
+
+    If setting up the cameras fails, they are closed before the error is
+    raised. If recording fails on a camera or trigger thread, the first
+    error is raised here once every thread has stopped and the cameras are
+    closed.
+
     :param filename1: string filename of the first video file
     :param filename2: string filename of the second video file
     :param recordTime: float time of recording in seconds
@@ -25,57 +109,429 @@ def videos_from_two_cameras(filename1, filename2, recordTime, pixFormatCam,
     :param fps: float frame rate in frames per second
     :param pixFormatVideo: string to choose pixel format for the video writer
     :param: writer: string either 'imageio' or 'FFMPEG' to choose video writer
-
-    :returns: None
+    :param triggered: bool use a software trigger scheduler to synchronize
+                      the cameras instead of free-running them
+    :param busNames: list of two strings, shared memory names to publish the
+                     frames of each camera under, or None to not publish
+    :param planResources: bool pin grab threads and encoders to separate cores
+    :param threadBudget: int total ffmpeg threads to share between cameras,
+                         defaults to one thread per core given to an encoder
+    :param correctionFiles: list of two .npz file paths with the 'dark',
+                            'flat' and/or 'background' arrays of each camera,
+                            or None for no correction
+    :param gating: dict of 'gating.ActivityGate' keyword arguments, at least
+                   'threshold', or None to keep every frame
+    :param stereoCalibration: string path of a stereo calibration file, see
+                              'rectification.load_stereo_calibration', or None
+    :param memoryLimit: int bytes of frames to queue in memory per camera
+                        before spilling to disk, or None to never spill
+    :param spillDir: string directory for spill files, the system temporary
+                     directory if None
+    :param profile: string name of an entry of ACQUISITION_PROFILES or a dict
+                    in the same form, or None to leave the camera geometry
+
+    :returns: dict of run statistics, with a 'trigger' entry when triggered
+              and a 'resources' entry when resources were planned, and so
+              on for 'gating' and 'bandwidth'; 'spill' is always there
     """
     cams = create_n_cameras(2)
     numImages = int(fps * recordTime)
+    report = {}
 
     cams.Open()
-
-    set_camera_properties(cams[0], fps, pixFormatCam, camExposure)
-    set_camera_properties(cams[1], fps, pixFormatCam, camExposure)
-
-    # start recording on two threads
-    t1 = Thread(target=camera_video, args=(cams[0], filename1, numImages, fps,
-                                           pixFormatVideo, writer))
-    t2 = Thread(target=camera_video, args=(cams[1], filename2, numImages, fps,
-                                           pixFormatVideo, writer))
-    t1.start()
-    t2.start()
-
-    # wait till execution is done
-    t1.join()
-    t2.join()
-
-    cams.Close()
-
-    return
-
-
-def set_camera_properties(cam, fps, pixFormatCam, camExposure):
+    publishers = [None, None]
+    threads = []
+    errors = []
+    try:
+        if profile is not None:
+            apply_acquisition_profile(cams[0], profile)
+            apply_acquisition_profile(cams[1], profile)
+        set_camera_properties(cams[0], fps, pixFormatCam, camExposure,
+                              triggered)
+        set_camera_properties(cams[1], fps, pixFormatCam, camExposure,
+                              triggered)
+        if profile is not None:
+            report["bandwidth"] = [profile_bandwidth(cam, fps)
+                                   for cam in cams]
+        stages = _processing_stages(cams, pixFormatCam, correctionFiles,
+                                    stereoCalibration)
+
+        # in trigger mode every triggered frame has to be kept, in order
+        if triggered:
+            strategy = pylon.GrabStrategy_OneByOne
+        else:
+            strategy = pylon.GrabStrategy_LatestImageOnly
+        frameTimes = [[], []]
+        triggerTimes = [[], []]
+        if busNames is not None:
+            publishers = [FrameBusPublisher(name) for name in busNames]
+
+        plan = None
+        if planResources:
+            plan = plan_resources(2, threadBudget=threadBudget)
+        usages = [{}, {}]
+        gates = [None, None]
+        if gating is not None:
+            gates = [ActivityGate(**gating) for _ in range(2)]
+
+        # start recording on two threads
+        for idx, fname in enumerate((filename1, filename2)):
+            threads.append(Thread(target=_collect_errors, args=(
+                errors, camera_video, cams[idx], fname, numImages, fps,
+                pixFormatVideo, writer, strategy, frameTimes[idx],
+                publishers[idx], plan[idx] if plan else None, usages[idx],
+                None, stages[idx], gates[idx], memoryLimit, spillDir)))
+            threads[-1].start()
+
+        if triggered:
+            scheduler = Thread(target=_collect_errors, args=(
+                errors, trigger_scheduler, cams, numImages, fps,
+                triggerTimes))
+            scheduler.start()
+            scheduler.join()
+    finally:
+        # wait till execution is done, the cameras are closed even if
+        # setting them up failed
+        for thread in threads:
+            thread.join()
+
+        cams.Close()
+
+        for publisher in publishers:
+            if publisher is not None:
+                publisher.close()
+
+    if errors:
+        raise errors[0]
+
+    if triggered:
+        report["trigger"] = trigger_report(triggerTimes, frameTimes)
+    if plan:
+        report["resources"] = resource_report(plan, usages, frameTimes, fps)
+    report["spill"] = [usage["spill"] for usage in usages]
+    for idx, stats in enumerate(report["spill"]):
+        print("camera %d: spilled %d of %d frames (%.1f MB, peak %.1f MB on "
+              "disk), drained at %.1f MB/s" % (
+                  idx, stats["spilledFrames"], stats["frames"],
+                  stats["spilledBytes"] / 1e6, stats["peakSpillBytes"] / 1e6,
+                  stats["drainRate"] / 1e6))
+    if gating is not None:
+        report["gating"] = [gate.report() for gate in gates]
+        for idx, stats in enumerate(report["gating"]):
+            print("camera %d: kept %d of %d frames, %.1f%% idle frames "
+                  "dropped" % (idx, stats["kept"], stats["frames"],
+                               100 * stats["dropped"]))
+
+    return report
+
+
+def _processing_stages(cams, pixFormatCam, correctionFiles,
+                       stereoCalibration):
+    """Returns the list of processing stages of each camera.
+
+    Checks the correction arrays against the frame size each camera records
+    with, and moves the stereo calibration to each camera's ROI, binning and
+    decimation.
+    """
+    stages = [[], []]
+    if correctionFiles is not None:
+        maxValue = max_pixel_value(pixFormatCam)
+        for idx, f in enumerate(correctionFiles):
+            stage = CalibrationStage.from_file(f, maxValue)
+            shape = (cams[idx].Height(), cams[idx].Width())
+            if stage.offset.shape != shape:
+                raise ValueError(
+                    "correction arrays in %s are %dx%d, but camera %d "
+                    "records %dx%d frames, record them with the same "
+                    "profile" % (f, stage.offset.shape[1],
+                                 stage.offset.shape[0], idx, shape[1],
+                                 shape[0]))
+            stages[idx].append(stage)
+    if stereoCalibration is not None:
+        rois = [(cam.Width(), cam.Height(), cam.OffsetX(), cam.OffsetY())
+                for cam in cams]
+        maps = rectification_maps(load_stereo_calibration(stereoCalibration),
+                                  rois, sampling=[_sampling(cam)
+                                                  for cam in cams])
+        for idx, (map1, map2) in enumerate(maps):
+            stages[idx].append(RemapStage(map1, map2))
+
+    return stages
+
+
+def set_camera_properties(cam, fps, pixFormatCam, camExposure,
+                          triggered=False):
     """Sets FPS, pixel format and exposure time for a Basler camera.
 
+    In free-run mode the camera paces itself at the given frame rate. In
+    triggered mode the frame rate limit is switched off and every frame start
+    waits for a software trigger, see 'trigger_scheduler'.
+
     :param cam: Basler camera object
     :param fps: float desired frame rate in frames per second
     :param pixFormatCam: string desired camera pixel format
     :param camExposure: int exposure time in microseconds
+    :param triggered: bool configure the camera for software triggering
 
     :returns: None
     """
     cam.PixelFormat = pixFormatCam
-    cam.AcquisitionFrameRateEnable.SetValue(True)
-    cam.AcquisitionFrameRate.SetValue(fps)
+    cam.TriggerSelector.SetValue("FrameStart")
+    if triggered:
+        cam.AcquisitionFrameRateEnable.SetValue(False)
+        cam.TriggerMode.SetValue("On")
+        cam.TriggerSource.SetValue("Software")
+    else:
+        cam.TriggerMode.SetValue("Off")
+        cam.AcquisitionFrameRateEnable.SetValue(True)
+        cam.AcquisitionFrameRate.SetValue(fps)
     cam.ExposureTime.SetValue(camExposure)
 
 
-def camera_video(cam, fname, numImages, fps, pixFormatVideo, writer):
+def apply_acquisition_profile(cam, profile):
+    """Sets ROI, binning and decimation of a Basler camera from a profile.
+
+    Binning and decimation are applied first, as they change the available
+    area, then the ROI. ROI sizes and offsets are rounded down to what the
+    camera accepts and sizes to even numbers, which the video encoders need.
+    Asking for binning or decimation on a camera without it raises a
+    ValueError.
+
+    :param cam: Basler camera object, opened
+    :param profile: string name of an entry of ACQUISITION_PROFILES or a dict
+                    in the same form
+
+    :returns: tuple (width, height, offsetX, offsetY) of the resulting ROI
+    """
+    if isinstance(profile, str):
+        profile = ACQUISITION_PROFILES[profile]
+
+    # start from the top left so the ROI can grow to its maximum
+    for name in ("OffsetX", "OffsetY"):
+        if _writable(cam, name):
+            getattr(cam, name).SetValue(0)
+
+    for feature in ("binning", "decimation"):
+        factor = profile.get(feature, 1)
+        for direction in ("Horizontal", "Vertical"):
+            name = feature.capitalize() + direction
+            if _writable(cam, name):
+                getattr(cam, name).SetValue(factor)
+            elif factor != 1:
+                raise ValueError("camera does not support %s" % feature)
+
+    roi = profile.get("roi") or (1.0, 1.0)
+    size = []
+    for value, node in zip(roi, (cam.Width, cam.Height)):
+        if isinstance(value, float):
+            value = int(node.Max * value)
+        value = min(value, node.Max)
+        value -= (value - node.Min) % node.Inc
+        value -= value % 2
+        node.SetValue(value)
+        size.append(value)
+
+    offset = profile.get("offset")
+    offsets = []
+    for idx, name in enumerate(("OffsetX", "OffsetY")):
+        if not _writable(cam, name):
+            offsets.append(0)
+            continue
+        node = getattr(cam, name)
+        if offset is None:
+            value = node.Max // 2
+        else:
+            value = min(offset[idx], node.Max)
+        value -= value % node.Inc
+        node.SetValue(value)
+        offsets.append(value)
+
+    return size[0], size[1], offsets[0], offsets[1]
+
+
+def profile_bandwidth(cam, fps, linkBandwidth=None):
+    """Reports the link bandwidth a camera needs with its current settings.
+
+    Compares the bytes per second of the current ROI, binning, decimation and
+    pixel format at the given frame rate with reading out the full sensor in
+    the same pixel format, and works out how many such cameras fit on one
+    link.
+
+    :param cam: Basler camera object, opened and configured
+    :param fps: float frame rate in frames per second
+    :param linkBandwidth: float usable bytes per second of the camera's link,
+                          guessed from the device class if None
+
+    :returns: dict with the frame size, 'bandwidth' and 'fullBandwidth' in
+              bytes per second and 'camerasPerLink'
+    """
+    width, height = cam.Width(), cam.Height()
+    payload = cam.PayloadSize()
+    sensor = []
+    for name, node in (("SensorWidth", cam.Width),
+                       ("SensorHeight", cam.Height)):
+        if genicam.IsReadable(cam.GetNodeMap().GetNode(name)):
+            sensor.append(getattr(cam, name)())
+        else:
+            sensor.append(node.Max)
+    fullPayload = payload * sensor[0] * sensor[1] / (width * height)
+
+    if linkBandwidth is None:
+        linkBandwidth = LINK_BANDWIDTH.get(
+            cam.GetDeviceInfo().GetDeviceClass())
+    stats = {"width": width, "height": height, "bandwidth": payload * fps,
+             "fullBandwidth": fullPayload * fps, "camerasPerLink": None}
+    if linkBandwidth:
+        stats["camerasPerLink"] = int(linkBandwidth // stats["bandwidth"])
+
+    print("%s: %dx%d, %.1f MB/s (%.1f%% of full sensor)%s" % (
+        cam.GetDeviceInfo().GetFriendlyName(), width, height,
+        stats["bandwidth"] / 1e6,
+        100 * stats["bandwidth"] / stats["fullBandwidth"],
+        "" if stats["camerasPerLink"] is None else
+        ", %d cameras per link" % stats["camerasPerLink"]))
+
+    return stats
+
+
+def _writable(cam, name):
+    """Checks if the camera has a writable feature of the given name."""
+    return genicam.IsWritable(cam.GetNodeMap().GetNode(name))
+
+
+def _sampling(cam):
+    """Returns the (binningX, binningY, decimationX, decimationY) of a camera,
+    1 for what it does not support."""
+    values = []
+    for name in ("BinningHorizontal", "BinningVertical",
+                 "DecimationHorizontal", "DecimationVertical"):
+        if genicam.IsReadable(cam.GetNodeMap().GetNode(name)):
+            values.append(getattr(cam, name)())
+        else:
+            values.append(1)
+
+    return tuple(values)
+
+
+def trigger_scheduler(cams, numTriggers, fps, triggerTimes, spin=0.002,
+                      startTimeout=10.0):
+    """Fires software triggers on all cameras at a fixed rate.
+
+    Waits until every camera is grabbing, and raises a TimeoutError if that
+    takes longer than 'startTimeout' seconds, for example because a camera
+    thread failed before it started. It then issues 'numTriggers' rounds of
+    triggers. Round i is due at an absolute deadline of start + i / fps on the
+    monotonic performance counter, so timing errors do not accumulate the way
+    they do with repeated sleep(1 / fps) calls. The thread sleeps until 'spin'
+    seconds before each deadline and busy-waits the rest of the way. If a round
+    is late it fires immediately and the next one is still due on schedule.
+
+    :param cams: Basler camera array object, cameras in trigger mode
+    :param numTriggers: int number of trigger rounds to fire
+    :param fps: float trigger rate in triggers per second
+    :param triggerTimes: list of one list per camera, the time each trigger
+                         was executed is appended to it
+    :param spin: float seconds before each deadline to start busy-waiting
+    :param startTimeout: float seconds to wait for the cameras to start
+                         grabbing
+
+    :returns: None
+    """
+    deadline = perf_counter() + startTimeout
+    while not all(cam.IsGrabbing() for cam in cams):
+        if perf_counter() > deadline:
+            raise TimeoutError("cameras did not start grabbing within %.1f s"
+                               % startTimeout)
+        sleep(0.001)
+
+    period = 1.0 / fps
+    start = perf_counter() + period
+    for i in range(numTriggers):
+        deadline = start + i * period
+        remaining = deadline - perf_counter()
+        if remaining > spin:
+            sleep(remaining - spin)
+        while perf_counter() < deadline:
+            pass
+
+        for idx, cam in enumerate(cams):
+            cam.WaitForFrameTriggerReady(
+                1000, pylon.TimeoutHandling_ThrowException)
+            cam.ExecuteSoftwareTrigger()
+            triggerTimes[idx].append(perf_counter())
+
+
+def trigger_report(triggerTimes, frameTimes):
+    """Summarizes the timing of a triggered recording.
+
+    Latency is the time from executing a trigger on a camera to that frame
+    being retrieved on the host. Spread is, for each frame number, the
+    difference between the earliest and the latest retrieval over all cameras,
+    summarized by its mean, 99th percentile and maximum.
+    All values are in milliseconds and are printed as well as returned.
+
+    :param triggerTimes: list of one list of trigger times per camera
+    :param frameTimes: list of one list of frame retrieval times per camera
+
+    :returns: dict with per camera latency and inter-camera spread statistics
+    """
+    report = {"latency": []}
+    for idx, (trig, frames) in enumerate(zip(triggerTimes, frameTimes)):
+        lat = [1000 * (f - t) for t, f in zip(trig, frames)]
+        stats = {"mean": mean(lat), "std": pstdev(lat), "max": max(lat),
+                 "frames": len(frames), "triggers": len(trig)}
+        report["latency"].append(stats)
+        print("camera %d: %d triggers, %d frames, latency mean %.3f ms, "
+              "std %.3f ms, max %.3f ms" % (idx, stats["triggers"],
+                                            stats["frames"], stats["mean"],
+                                            stats["std"], stats["max"]))
+
+    spread = sorted(1000 * (max(t) - min(t)) for t in zip(*frameTimes))
+    p99 = spread[-(-99 * len(spread) // 100) - 1]  # nearest rank
+    report["spread"] = {"mean": mean(spread), "p99": p99, "max": spread[-1]}
+    print("spread between cameras: mean %.3f ms, 99th percentile %.3f ms, "
+          "max %.3f ms" % (report["spread"]["mean"], report["spread"]["p99"],
+                           report["spread"]["max"]))
+
+    return report
+
+
+def camera_video(cam, fname, numImages, fps, pixFormatVideo, writer,
+                 strategy=pylon.GrabStrategy_LatestImageOnly, frameTimes=None,
+                 publisher=None, plan=None, usage=None, codec=None,
+                 stages=None, gate=None, memoryLimit=None, spillDir=None):
     """Records a video from the given Basler camera.
 
-    Grabs 'numImages' images using the LatestImage and GrabbingMax strategy and
-    stores them in a buffer array. Using a video writer, either from imageio
-    library or from Issue #113 on pypylon GitHub repository, write them to a
-    video saved at the given filename.
+    Grabs 'numImages' images using the given grab strategy, LatestImageOnly by
+    default, and queues them for an encoder thread that runs alongside. Using
+    a video writer, either from imageio library or from Issue #113 on pypylon
+    GitHub repository, the encoder writes them to a video saved at the given
+    filename, see 'write_video'.
+
+    The queue keeps frames in memory up to 'memoryLimit' bytes. When the
+    encoder falls behind further than that, frames overflow to a spill file on
+    local disk and are read back in order once it catches up, so the grab
+    loop never blocks and no frame is dropped, see 'spillqueue.SpillQueue'.
+    If grabbing fails, the frames grabbed so far are still encoded and the
+    spill file is removed before the error is raised. If encoding fails,
+    grabbing stops right away and the encoder's error is raised.
+
+    Cameras in a packed 12-bit pixel format, see 'unpacking.PACKED_FORMATS',
+    are queued packed and each frame is unpacked into one reused 16-bit
+    array just before it is written. High bit depth frames need the 'FFMPEG'
+    writer with a 16-bit 'pixFormatVideo' such as 'gray16le', and are encoded
+    losslessly with FFV1 unless another codec is given. Frames published to a
+    frame bus are unpacked on the grab thread, so subscribers always get
+    images.
+
+    Processing stages, such as 'processing.CalibrationStage', are run on
+    small batches of frames on a worker pool between the queue and the
+    writer, see 'processing.BatchPipeline'. Their output goes into reused
+    buffers that are handed straight to the writer.
+
+    An activity gate drops frames of a static scene after processing, see
+    'gating.ActivityGate', and the numbers and times of the frames it kept
+    are saved to <fname>.frames.csv.
 
     :param cam: Basler camera object
     :param fname: string filename to store the video
@@ -83,42 +539,190 @@ def camera_video(cam, fname, numImages, fps, pixFormatVideo, writer):
     :param fps: float frame rate in frames per second
     :param pixFormatVideo: string pixel format for the video writer
     :param writer: string choice of video writer, 'imageio' or 'FFMPEG'
+    :param strategy: pylon grab strategy, use OneByOne in trigger mode
+    :param frameTimes: list, if given the retrieval time of every frame on the
+                       monotonic performance counter is appended to it
+    :param publisher: FrameBusPublisher to share every grabbed frame with
+                      other processes, or None
+    :param plan: dict with the 'grab' and 'encode' core sets and ffmpeg
+                 'threads' count for this camera, from 'plan_resources'
+    :param usage: dict, the queue's spill statistics are stored in it under
+                  'spill', and if a plan is given the measured grab thread
+                  preemption and encoder CPU use too
+    :param codec: string ffmpeg codec, defaults to 'libx264' for 8-bit and to
+                  'ffv1' for high bit depth pixel formats
+    :param stages: list of processing stages to apply to every frame before
+                   it is written, or None
+    :param gate: ActivityGate to drop static frames with, or None
+    :param memoryLimit: int bytes of frames to queue in memory before spilling
+                        to disk, or None to never spill
+    :param spillDir: string directory for the spill file, the system temporary
+                     directory if None
 
     :returns: None"""
-    # sleep for a bit
-    sleep(1)
-
-    # grab images for the video and store them in a buffer
-    cam.StartGrabbingMax(numImages, pylon.GrabStrategy_LatestImageOnly)
-    buffer = []  # TODO find a better way
-    while cam.IsGrabbing():
-        res = cam.RetrieveResult(1000)
-        buffer.append(res.Array)
-        res.Release()
-
-    if writer == "imageio":
-        with iio.get_writer(
-            fname,  # mkv players often support H.264
-            fps=fps,  # FPS is in units Hz; should be real-time.
-            codec='libx264',  # When used properly, this is basically
-                              # "PNG for video" (i.e. lossless)
-            quality=None,  # disables variable compression
-            pixelformat=pixFormatVideo,  # keep it as RGB colours
-            ffmpeg_params=[  # compatibility with older library versions
+    if frameTimes is None:
+        frameTimes = []
+    if usage is None:
+        usage = {}
+    if plan is not None:
+        pin_current_thread(plan["grab"])
+        switches = thread_context_switches()[1]
+
+    pixFormatCam = cam.PixelFormat.GetValue()
+    unpacker = busUnpacker = None
+    if pixFormatCam in PACKED_FORMATS:
+        unpacker = Mono12Unpacker(cam.Height(), cam.Width(), pixFormatCam)
+        if publisher is not None:
+            # the encoder's unpacker reuses its output, so use one of our own
+            busUnpacker = Mono12Unpacker(cam.Height(), cam.Width(),
+                                         pixFormatCam)
+    if is_high_bit_depth(pixFormatCam):
+        if writer == "imageio":
+            raise ValueError("the imageio writer only takes 8-bit frames, use "
+                             "'FFMPEG' to record %s" % pixFormatCam)
+        if codec is None:
+            codec = "ffv1"
+    elif codec is None:
+        codec = "libx264"
+
+    queue = SpillQueue(memoryLimit, spillDir)
+    frames = iter(queue)
+    if stages:
+        if unpacker is None:
+            frames = BatchPipeline(stages).map(frames)
+        else:
+            frames = BatchPipeline([unpacker] + stages).map(
+                frames, (cam.Height(), cam.Width()), np.uint16)
+    elif unpacker is not None:
+        frames = map(unpacker, frames)
+    if gate is not None:
+        frames = gate.filter(frames, frameTimes)
+
+    # encode on a thread of its own while this one keeps grabbing
+    errors = []
+    encoder = Thread(target=write_video, args=(
+        frames, fname, (cam.Height(), cam.Width()), fps, pixFormatVideo,
+        writer, codec, plan, usage, errors))
+    encoder.start()
+
+    try:
+        # sleep for a bit
+        sleep(1)
+
+        # grab images for the video and queue them for the encoder
+        cam.StartGrabbingMax(numImages, strategy)
+        while cam.IsGrabbing():
+            if not encoder.is_alive():
+                # the encoder only stops early when writing failed
+                cam.StopGrabbing()
+                break
+            res = cam.RetrieveResult(1000)
+            frameTimes.append(perf_counter())
+            if unpacker is None:
+                frame = res.Array
+            else:
+                frame = np.frombuffer(res.GetBuffer(), np.uint8)
+            queue.put(frame)
+            if busUnpacker is not None:
+                publisher.publish(busUnpacker(frame), frameTimes[-1])
+            elif publisher is not None:
+                publisher.publish(frame, frameTimes[-1])
+            res.Release()
+    finally:
+        # let the encoder finish what was grabbed, even if grabbing failed
+        queue.close()
+        encoder.join()
+        queue.remove()
+        usage["spill"] = queue.report()
+
+    if plan is not None:
+        usage["grabPreempted"] = thread_context_switches()[1] - switches
+    if errors:
+        raise errors[0]
+
+    if gate is not None:
+        gate.save(fname + ".frames.csv", frameTimes[0] if frameTimes else None)
+
+    return
+
+
+def write_video(frames, fname, size, fps, pixFormatVideo, writer, codec,
+                plan=None, usage=None, errors=None):
+    """Writes frames to a video file as they arrive.
+
+    Runs on the encoder thread of 'camera_video'. With a resource plan, the
+    thread first pins itself to the plan's encoder cores, so that the ffmpeg
+    process it starts, and any processing worker threads, inherit them.
+
+    :param frames: iterable of numpy arrays, ends when the recording is done
+    :param fname: string filename to store the video
+    :param size: tuple (height, width) of the frames in pixels
+    :param fps: float frame rate in frames per second
+    :param pixFormatVideo: string pixel format for the video writer
+    :param writer: string choice of video writer, 'imageio' or 'FFMPEG'
+    :param codec: string ffmpeg codec
+    :param plan: dict resource plan of this camera, or None
+    :param usage: dict the encoder CPU use is stored in when planned
+    :param errors: list, an exception raised while writing is appended to it
+                   instead of being lost with the thread
+
+    :returns: None
+    """
+    try:
+        ffmpegThreads = None
+        if plan is not None:
+            pin_current_thread(plan["encode"])
+            ffmpegThreads = plan["threads"]
+        encodeStart = perf_counter()
+
+        if writer == "imageio":
+            ffmpegParams = [  # compatibility with older library versions
                 '-preset',  # set to faster, veryfast, superfast, ultrafast
                 'medium',     # for higher speed but worse compression
                 '-crf',  # quality; set to 0 for lossless, but keep in mind
                 '11'     # that the camera probably adds static anyway
-                        ]) as writer:
-            for image in buffer:
-                writer.append_data(image)
-    else:
-        with FFMPEGVideoWriter(fname, (cam.Height(), cam.Width()), fps=20,
-                               pixfmt=pixFormatVideo) as writer:
-            for image in buffer:
-                writer.write_frame(image)
-
-    return
+                        ]
+            if ffmpegThreads is not None:
+                ffmpegParams.extend(['-threads', str(ffmpegThreads)])
+            with iio.get_writer(
+                    fname,  # mkv players often support H.264
+                    fps=fps,  # FPS is in units Hz; should be real-time.
+                    macro_block_size=2,  # only pad ROIs to even sizes
+                    codec=codec,  # When used properly, libx264 is basically
+                                  # "PNG for video" (i.e. lossless)
+                    quality=None,  # disables variable compression
+                    pixelformat=pixFormatVideo,  # keep it as RGB colours
+                    ffmpeg_params=ffmpegParams) as writer:
+                for image in frames:
+                    writer.append_data(image)
+                if plan is not None:
+                    encoder_usage(usage, encodeStart)
+        else:
+            preset, ffmpegParams = None, None
+            if codec == "libx264":
+                preset = "medium"
+            elif codec == "ffv1":
+                ffmpegParams = ["-level", "3"]
+            with FFMPEGVideoWriter(fname, size, fps=fps, codec=codec,
+                                   preset=preset, pixfmt=pixFormatVideo,
+                                   threads=ffmpegThreads,
+                                   ffmpeg_params=ffmpegParams) as writer:
+                for image in frames:
+                    writer.write_frame(image)
+                if plan is not None:
+                    encoder_usage(usage, encodeStart)
+    except Exception as err:
+        if errors is None:
+            raise
+        errors.append(err)
+
+
+def _collect_errors(errors, target, *args):
+    """Runs target(*args) on a thread, appending what it raises to errors."""
+    try:
+        target(*args)
+    except Exception as err:
+        errors.append(err)
 
 
 def create_n_cameras(n):
@@ -153,7 +757,10 @@ if __name__ == "__main__":
     VIDPIXFMT = "gray"  # since camera is in Mono mode
     CAMEXPTIME = 40000
     WRITER = "imageio"  # use either "imageio" or "FFMPEG"
+    # for 12-bit use CAMPIXFMT = "Mono12p", VIDPIXFMT = "gray16le" and
+    # WRITER = "FFMPEG", which records lossless FFV1 16-bit video
+    TRIGGERED = False  # True to synchronize the cameras by software trigger
 
     # shoot video
     videos_from_two_cameras(FILE1, FILE2, RECORDING_TIME, CAMPIXFMT,
-                            CAMEXPTIME, FPS, VIDPIXFMT, WRITER)
+                            CAMEXPTIME, FPS, VIDPIXFMT, WRITER, TRIGGERED)
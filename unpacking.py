@@ -0,0 +1,194 @@
+import sys
+import threading
+import numpy as np
+
+
+def unpack_mono12p(packed, out, scratch=None):
+    """Unpacks Mono12p data into 16-bit pixels.
+
+    Mono12p (GenICam PFNC) packs two pixels into three bytes, least
+    significant bits first, so on a little-endian host every three bytes read
+    as a 24-bit word w hold the first pixel in w & 0xFFF and the second one in
+    w >> 12. Each word is read through a 4-byte view that steps 3 bytes at a
+    time, and both pixels are written at once as one 32-bit word of 'out'.
+    The last pair is unpacked on its own, since its 4-byte read would run past
+    the end of the frame.
+
+    All work is done with in-place NumPy operations on 'out' and 'scratch',
+    so no memory is allocated per frame when both are given.
+
+    :param packed: numpy uint8 array of the raw frame, 3 bytes per 2 pixels
+    :param out: numpy uint16 array receiving the pixels, any shape with
+                2 / 3 times as many elements as 'packed', C-contiguous
+    :param scratch: numpy uint32 array with one element per pixel pair, or None
+
+    :returns: out
+    """
+    triplets, pairs, scratch = _views(packed, out, scratch, np.uint32)
+    if sys.byteorder != "little" or not out.flags.c_contiguous:
+        return _unpack_mono12p_bytes(triplets, pairs, out)
+
+    n = triplets.shape[0] - 1
+    words = np.ndarray((n,), np.uint32, np.ascontiguousarray(packed),
+                       strides=(3,))
+    low = out.reshape(-1).view(np.uint32)[:n]
+    high = scratch[:n]
+
+    np.bitwise_and(words, 0xFFF000, out=high)
+    np.left_shift(high, 4, out=high)
+    np.bitwise_and(words, 0xFFF, out=low)
+    np.bitwise_or(low, high, out=low)
+
+    _unpack_mono12p_bytes(triplets[n:], pairs[n:], out)
+
+    return out
+
+
+def _unpack_mono12p_bytes(triplets, pairs, out):
+    """Byte-wise Mono12p unpacking for big-endian hosts and the last pair."""
+    first, second = pairs[:, 0], pairs[:, 1]
+
+    np.bitwise_and(triplets[:, 1], 0x0F, out=first)
+    np.left_shift(first, 8, out=first)
+    np.bitwise_or(first, triplets[:, 0], out=first)
+
+    np.copyto(second, triplets[:, 2])
+    np.left_shift(second, 4, out=second)
+    np.bitwise_or(second, triplets[:, 1] >> 4, out=second)
+
+    return out
+
+
+def unpack_mono12packed(packed, out, scratch=None):
+    """Unpacks Basler's GigE Mono12Packed data into 16-bit pixels.
+
+    Mono12Packed stores the most significant bits of each pixel in a byte of
+    its own: byte 0 holds bits 4-11 of the first pixel, byte 2 holds bits 4-11
+    of the second pixel and byte 1 holds bits 0-3 of the first pixel in its low
+    nibble and bits 0-3 of the second pixel in its high nibble.
+
+    :param packed: numpy uint8 array of the raw frame, 3 bytes per 2 pixels
+    :param out: numpy uint16 array receiving the pixels, any shape with
+                2 / 3 times as many elements as 'packed'
+    :param scratch: numpy uint8 or uint32 array with one element per pixel
+                    pair, or None
+
+    :returns: out
+    """
+    triplets, pairs, scratch = _views(packed, out, scratch, np.uint8)
+    first, second = pairs[:, 0], pairs[:, 1]
+
+    np.copyto(first, triplets[:, 0])
+    np.left_shift(first, 4, out=first)
+    np.bitwise_and(triplets[:, 1], 0x0F, out=scratch)
+    np.bitwise_or(first, scratch, out=first)
+
+    np.copyto(second, triplets[:, 2])
+    np.left_shift(second, 4, out=second)
+    np.right_shift(triplets[:, 1], 4, out=scratch)
+    np.bitwise_or(second, scratch, out=second)
+
+    return out
+
+
+def _views(packed, out, scratch, dtype):
+    """Returns (pairs, 3) byte and (pairs, 2) pixel views and a scratch array
+    of the given dtype with one element per pair."""
+    triplets = packed.reshape(-1, 3)
+    pairs = out.reshape(-1, 2)
+    if pairs.shape[0] != triplets.shape[0]:
+        raise ValueError("%d packed bytes do not hold %d pixels" %
+                         (packed.size, out.size))
+    if scratch is None:
+        scratch = np.empty(triplets.shape[0], dtype)
+    else:
+        scratch = scratch.view(dtype)[:triplets.shape[0]]
+
+    return triplets, pairs, scratch
+
+
+# camera pixel formats that have to be unpacked before encoding
+PACKED_FORMATS = {
+    "Mono12p": unpack_mono12p,
+    "Mono12Packed": unpack_mono12packed,
+}
+
+
+def bit_depth(pixFormatCam):
+    """Returns the bits per pixel, or per color channel, of a pixel format.
+
+    :param pixFormatCam: string camera pixel format, e.g. 'Mono12p'
+
+    :returns: int 8, 10, 12, 14 or 16
+    """
+    for depth in (16, 14, 12, 10):
+        if str(depth) in pixFormatCam:
+            return depth
+
+    return 8
+
+
+def max_pixel_value(pixFormatCam):
+    """Returns the largest value a pixel of a camera pixel format can take.
+
+    Formats of 10 to 14 bits are delivered, or unpacked, into 16-bit frames
+    that they do not fill, so processing has to clip them to their own range.
+
+    :param pixFormatCam: string camera pixel format, e.g. 'Mono10'
+
+    :returns: int, e.g. 1023 for 10 bits, or None if the pixels fill their
+              8 or 16-bit dtype
+    """
+    depth = bit_depth(pixFormatCam)
+    if depth in (8, 16):
+        return None
+
+    return 2 ** depth - 1
+
+
+def is_high_bit_depth(pixFormatCam):
+    """Checks if a camera pixel format carries more than 8 bits per pixel.
+
+    :param pixFormatCam: string camera pixel format, e.g. 'Mono12p'
+
+    :returns: bool
+    """
+    return bit_depth(pixFormatCam) > 8
+
+
+class Mono12Unpacker:
+    """Unpacks packed 12-bit frames into a reused 16-bit buffer.
+
+    Every call returns the same output array, overwritten with the new frame,
+    so the result has to be written or copied before the next call. It can
+    also be used as the first stage of a 'processing.BatchPipeline', which
+    unpacks into the pipeline's own buffers instead.
+
+    Parameters
+    -----------
+
+    height, width
+      Frame size in pixels.
+
+    pixFormatCam
+      Camera pixel format, one of the keys of PACKED_FORMATS.
+    """
+
+    def __init__(self, height, width, pixFormatCam):
+        if (height * width) % 2:
+            raise ValueError("packed 12-bit frames need an even pixel count")
+        self.unpack = PACKED_FORMATS[pixFormatCam]
+        self.out = np.empty((height, width), np.uint16)
+        self.scratch = np.empty(height * width // 2, np.uint32)
+        self._local = threading.local()
+
+    def __call__(self, packed):
+        """Unpacks one raw frame and returns the reused 16-bit buffer."""
+        return self.unpack(packed, self.out, self.scratch)
+
+    def apply(self, src, dst):
+        """Unpacks src into dst, safe to call from several threads."""
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = np.empty_like(self.scratch)
+        self.unpack(src, dst, scratch)